@@ -1,4 +1,6 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 # from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 import streamlit as st
@@ -6,6 +8,7 @@ from langchain.prompts import PromptTemplate
 from typing import Optional
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
+from common.streaming import TextStream
 
 # Initialize OpenAI API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -111,23 +114,14 @@ article_prompt = PromptTemplate(
 )
 
 
-def process_transcript(transcript: str) -> Optional[str]:
-    """Process the YouTube transcript using a two-step approach"""
-    try:
-        # Step 1: Extract all points
-        points_response = llm.invoke(points_prompt.format(transcript=transcript))
-        extracted_points = points_response.content
-
-        # Step 2: Create article from extracted points
-        article_response = llm.invoke(article_prompt.format(extracted_points=extracted_points))
-
-        # Return both the points and the article
-        return {
-            "extracted_points": extracted_points,
-            "article": article_response.content
-        }
-    except Exception as e:
-        return f"Error processing transcript: {str(e)}"
+def stream_points(transcript: str) -> TextStream:
+    """Step 1 of the two-step approach: stream every key point in the transcript"""
+    return TextStream(llm.stream(points_prompt.format(transcript=transcript)), name="extract_points")
+
+
+def stream_article(extracted_points: str) -> TextStream:
+    """Step 2: stream the SEO article written from the extracted points"""
+    return TextStream(llm.stream(article_prompt.format(extracted_points=extracted_points)), name="article")
 
 
 # Streamlit UI
@@ -147,14 +141,18 @@ if st.button("Convert to Article"):
                 if not transcript:
                     st.error("Could not fetch transcript. Make sure the video has closed captions available.")
                 else:
-                    result = process_transcript(transcript)
-                    if isinstance(result, dict):
+                    try:
+                        # Each step renders as it generates; the article starts once the points are complete
                         st.subheader("Extracted Key Points")
-                        st.markdown(result["extracted_points"])
+                        points = stream_points(transcript)
+                        st.write_stream(points)
+                        st.caption(points.summary())
                         st.subheader("Generated Article")
-                        st.markdown(result["article"])
-                    else:
-                        st.error(result)
+                        article = stream_article(points.text)
+                        st.write_stream(article)
+                        st.caption(article.summary())
+                    except Exception as e:
+                        st.error(f"Error processing transcript: {str(e)}")
     else:
         st.warning("Please enter a YouTube video URL")
 
@@ -1,6 +1,9 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 import streamlit as st
+from common.streaming import TextStream
 # from langchain.globals import set_debug
 
 # set_debug(True)
@@ -13,5 +16,7 @@ st.title("What do you want to Know?")
 question = st.text_input("Enter a question: ")
 
 if question:
-    response = llm.invoke(question)
-    st.write(response.content)
\ No newline at end of file
+    # Tokens render as they arrive instead of after the whole answer is generated
+    answer = TextStream(llm.stream(question), name="streamlit_demo")
+    st.write_stream(answer)
+    st.caption(answer.summary())
\ No newline at end of file
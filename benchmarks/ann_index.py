@@ -0,0 +1,50 @@
+"""Build time, query latency percentiles and recall@k for flat, HNSW and IVF indexes
+
+Usage: python benchmarks/ann_index.py --count 200000 --dim 256
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from common.ann_index import build_index, choose_index_type
+from common.fakes import synthetic_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--kinds", nargs="+", default=["flat", "hnsw", "ivf"])
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.count, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.count, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    print(f"{args.count} x {args.dim}, auto would pick: {choose_index_type(args.count)}")
+    print(f"{'index':>6} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'recall@' + str(args.k):>9}")
+    _, exact = build_index(vectors, "flat").search(queries, args.k)
+    for kind in args.kinds:
+        start = time.perf_counter()
+        index = build_index(vectors, kind)
+        build_seconds = time.perf_counter() - start
+
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids[0])
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(results, exact)])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{kind:>6} {build_seconds:>8.2f} {p50:>7.3f} {p95:>7.3f} {p99:>7.3f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Chunks/sec of EmbeddingExecutor against a local fake embeddings server
+
+Usage: python benchmarks/embedding_concurrency.py --chunks 2000 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.embedding_executor import EmbeddingExecutor, approximate_tokens, token_counter
+from common.fakes import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--words-per-chunk", type=int, default=150)
+    parser.add_argument("--tokens-per-batch", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--tiktoken", action="store_true",
+                        help="count tokens with tiktoken instead of the offline estimate")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    chunks = [" ".join(f"word{(i * 7 + j) % 997}" for j in range(args.words_per_chunk))
+              for i in range(args.chunks)]
+
+    count_tokens = token_counter() if args.tiktoken else approximate_tokens
+
+    with FakeOpenAIServer(size=256, latency=args.latency, failure_rate=args.failure_rate) as server:
+        print(f"{'concurrency':>11} {'batches':>8} {'retries':>8} {'seconds':>8} {'chunks/sec':>11}")
+        for concurrency in args.concurrency:
+            executor = EmbeddingExecutor(api_key="fake", base_url=server.base_url,
+                                         max_tokens_per_batch=args.tokens_per_batch,
+                                         max_concurrency=concurrency, base_delay=0.05,
+                                         count_tokens=count_tokens)
+            requests_before = server.requests
+            start = time.perf_counter()
+            vectors = executor.embed_documents(chunks)
+            elapsed = time.perf_counter() - start
+            assert len(vectors) == len(chunks)
+            print(f"{concurrency:>11} {server.requests - requests_before:>8} {executor.retries:>8} "
+                  f"{elapsed:>8.2f} {len(chunks) / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Per-stage time, throughput and peak RSS of the ingestion pipeline, as JSON
+
+Runs load -> split -> embed -> index over the bundled corpora and scaled-up
+copies of them, each case in a fresh process so RSS figures don't leak
+between cases. Embeddings are deterministic and local, so numbers are
+comparable between commits.
+Usage: python benchmarks/ingestion_stages.py --scales 1 10 100 --output ingestion.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from common.ann_index import from_embeddings
+from common.fakes import DeterministicEmbeddings
+from common.loaders import load_source
+from parallel_loading import write_docx
+from upload_ingestion import large_pdf
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TEXT_CORPORA = ["rag/Legal_Document_Analysis_Data.txt", "rag/product-data.txt", "embeddings/job_listings.txt"]
+PDF_CORPUS = "rag/academic_research_data.pdf"
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def make_splitter(kind, chunk_size, chunk_overlap):
+    if kind == "recursive":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    from common.token_budget import make_splitter as project_splitter
+
+    return project_splitter(chunk_size, chunk_overlap, "tokens" if kind == "tokens" else "chars")
+
+
+def make_cases(folder, scales):
+    """Write every corpus at every scale into folder; returns (name, scale, path) triples"""
+    cases = []
+    for scale in scales:
+        for corpus in TEXT_CORPORA:
+            with open(os.path.join(ROOT, corpus), encoding="utf-8") as f:
+                text = f.read()
+            path = os.path.join(folder, f"{scale}x_{os.path.basename(corpus)}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text * scale)
+            cases.append((corpus, scale, path))
+            if corpus == TEXT_CORPORA[0]:
+                # No .docx ships with the repo, so the legal corpus stands in for Docx2txtLoader
+                path = os.path.join(folder, f"{scale}x_legal.docx")
+                write_docx(path, (text * scale).splitlines())
+                cases.append((corpus.replace(".txt", ".docx"), scale, path))
+        path = os.path.join(folder, f"{scale}x_{os.path.basename(PDF_CORPUS)}")
+        with open(path, "wb") as f:
+            from pypdf import PdfReader
+
+            f.write(large_pdf(len(PdfReader(os.path.join(ROOT, PDF_CORPUS)).pages) * scale))
+        cases.append((PDF_CORPUS, scale, path))
+    return cases
+
+
+def run_case(path, splitter_kind, chunk_size, chunk_overlap, dimensions, index_type):
+    """All four stages over one file; runs in its own process"""
+    stages = {}
+    megabytes = os.path.getsize(path) / 2**20
+
+    def stage(name, function, items=None):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        count = items(result) if items else None
+        stages[name] = {"seconds": seconds, "mb_per_second": megabytes / seconds if seconds else None,
+                        "items": count, "items_per_second": count / seconds if count and seconds else None,
+                        "peak_rss_mb": peak_rss_mb()}
+        return result
+
+    baseline = peak_rss_mb()
+    embeddings = DeterministicEmbeddings(dimensions)
+    splitter = make_splitter(splitter_kind, chunk_size, chunk_overlap)
+    documents = stage("load", lambda: load_source(path), len)
+    chunks = stage("split", lambda: splitter.split_documents(documents), len)
+    vectors = stage("embed", lambda: np.asarray(embeddings.embed_documents([c.page_content for c in chunks]),
+                                                dtype=np.float32), len)
+    stage("index", lambda: from_embeddings(chunks, vectors, embeddings, index_type), lambda store: store.index.ntotal)
+    return {"megabytes": megabytes, "documents": len(documents), "chunks": len(chunks),
+            "baseline_rss_mb": baseline, "stages": stages}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="how many times each corpus is repeated")
+    parser.add_argument("--splitter", choices=["offset", "recursive", "tokens"], default="offset",
+                        help="offset is the project's splitter; recursive is langchain's")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--index-type", choices=["auto", "flat", "hnsw", "ivf"], default="flat")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for corpus, scale, path in make_cases(folder, args.scales):
+            # A fresh process per case keeps peak RSS attributable to that case
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_case, path, args.splitter, args.chunk_size, args.chunk_overlap,
+                                     args.dimensions, args.index_type).result()
+            results.append({"corpus": corpus, "scale": scale, **result})
+            print(f"{corpus} x{scale}: " + ", ".join(f"{name} {stage['seconds']:.3f}s"
+                                                     for name, stage in result["stages"].items()),
+                  file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Speedup of load_files_parallel over a local folder of sample PDF/DOCX/TXT files
+
+Usage: python benchmarks/parallel_loading.py --copies 16 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.loaders import load_files_parallel
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_PDF = os.path.join(ROOT, "rag", "academic_research_data.pdf")
+SAMPLE_TEXTS = [os.path.join(ROOT, "rag", "Legal_Document_Analysis_Data.txt"),
+                os.path.join(ROOT, "rag", "product-data.txt"),
+                os.path.join(ROOT, "embeddings", "job_listings.txt")]
+
+
+def write_docx(path, paragraphs):
+    """Smallest .docx that Docx2txtLoader can read"""
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml",
+                      '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/'
+                      'package/2006/content-types"><Default Extension="xml" ContentType="application/xml"/>'
+                      '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-'
+                      'officedocument.wordprocessingml.document.main+xml"/></Types>')
+        docx.writestr("word/document.xml",
+                      '<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="http://schemas.openxmlformats.'
+                      f'org/wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>')
+
+
+def make_corpus(folder, copies):
+    texts = [open(path, encoding="utf-8").read() for path in SAMPLE_TEXTS]
+    for i in range(copies):
+        shutil.copy(SAMPLE_PDF, os.path.join(folder, f"paper_{i}.pdf"))
+        shutil.copy(SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)], os.path.join(folder, f"notes_{i}.txt"))
+        write_docx(os.path.join(folder, f"memo_{i}.docx"), (texts[i % len(texts)] * 20).splitlines())
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=16, help="files per format")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_corpus(folder, args.copies)
+        print(f"{len(paths)} files, {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'seconds':>8} {'speedup':>8} {'docs':>6} {'errors':>6}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            documents, report = load_files_parallel(paths, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            errors = sum(1 for entry in report if entry["error"])
+            print(f"{workers:>7} {elapsed:>8.2f} {baseline / elapsed:>7.2f}x {len(documents):>6} {errors:>6}")
+
+        by_format = {}
+        for entry in report:
+            extension = os.path.splitext(entry["path"])[1]
+            by_format.setdefault(extension, []).append(entry["seconds"])
+        for extension, seconds in sorted(by_format.items()):
+            print(f"{extension}: {sum(seconds) / len(seconds) * 1000:.1f} ms/file")
+
+
+if __name__ == "__main__":
+    main()
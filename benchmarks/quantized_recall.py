@@ -0,0 +1,76 @@
+"""Recall and size of QuantizedVectorStore compared with the FAISS flat index
+
+Usage: python benchmarks/quantized_recall.py rag/Legal_Document_Analysis_Data.txt --embeddings openai
+       python benchmarks/quantized_recall.py --synthetic 200000 --dim 1536
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.document_loaders import TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from common.fakes import DeterministicEmbeddings, synthetic_vectors
+from common.quantized_store import QuantizedVectorStore, compare_with_faiss
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="text files to chunk and embed")
+    parser.add_argument("--embeddings", choices=["fake", "openai"], default="fake")
+    parser.add_argument("--synthetic", type=int, help="use N synthetic vectors instead of files")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+        texts = [f"synthetic {i}" for i in range(len(vectors))]
+    else:
+        if args.embeddings == "openai":
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
+        else:
+            embeddings = DeterministicEmbeddings(args.dim)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        chunks = splitter.split_documents([doc for path in args.files for doc in TextLoader(path).load()])
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Queries are perturbed corpus vectors so that each has real neighbours
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    fake = DeterministicEmbeddings(vectors.shape[1])
+    faiss_store = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), fake)
+    print(f"corpus: {len(vectors)} x {vectors.shape[1]}, float32 FAISS flat: "
+          f"{vectors.nbytes / 2**20:.1f} MiB in RAM")
+
+    with tempfile.TemporaryDirectory() as root:
+        for dtype in ("float16", "int8"):
+            path = os.path.join(root, dtype)
+            QuantizedVectorStore.write(path, vectors, texts, dtype=dtype)
+            store = QuantizedVectorStore.load(path, fake)
+            start = time.perf_counter()
+            report = compare_with_faiss(store, faiss_store, queries, args.k)
+            elapsed = time.perf_counter() - start
+            print(f"{dtype}: codes {store.codes.nbytes / 2**20:.1f} MiB "
+                  f"(on disk {directory_size(path) / 2**20:.1f} MiB incl. float32 rescoring copy), "
+                  f"{elapsed * 1000 / (args.queries * len(report)):.2f} ms/query")
+            for row in report:
+                print(f"    rescore={row['rescore']:<3} recall@{args.k}={row['recall_at_k']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
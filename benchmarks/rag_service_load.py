@@ -0,0 +1,167 @@
+"""Throughput and latency of the async RAG service versus per-script chains, against a local mock OpenAI server
+
+The baseline answers each question the way the Streamlit scripts do: the
+app's shared chain over its plain retriever, invoked synchronously with one
+thread per concurrent session, so every question makes its own embedding
+call and FAISS search. The service renders the same prompts over batched
+embeddings and searches and gets the same questions over HTTP from this
+process. The mock server and the service each run in their own process, as
+a remote API and a deployed service would, so neither competes for this
+process's GIL.
+Usage: python benchmarks/rag_service_load.py --requests 200 --concurrency 32 --latency 0.05
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import aiohttp
+from aiohttp import web
+from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from common.embedding_executor import EmbeddingExecutor, approximate_tokens
+from common.fakes import FakeOpenAIServer
+from common.rag_apps import APPS, ROOT, app_chain, app_retriever, load_app_index
+from common.rag_service import ModelLimits, RagService
+
+
+def make_questions(count):
+    with open(os.path.join(ROOT, APPS["legal"].source), encoding="utf-8") as f:
+        lines = [line.split() for line in f if len(line.split()) >= 6]
+    return [" ".join(lines[n % len(lines)][:10]) + "?" for n in range(count)]
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def serve_fake(connection, **options):
+    """Run a FakeOpenAIServer in this process, answering each message on the pipe with its call counts"""
+    with FakeOpenAIServer(**options) as server:
+        connection.send(server.base_url)
+        while connection.recv():
+            connection.send(dict(server.paths))
+
+
+def serve_service(connection, base_url, model_concurrency, max_batch):
+    """Run a RagService hosting the legal app in this process until the pipe asks for its stats"""
+    embeddings = EmbeddingExecutor(api_key="fake", base_url=base_url, count_tokens=approximate_tokens,
+                                   keep_client=True)
+    llm = ChatOpenAI(model="gpt-4o", api_key="fake", base_url=base_url)
+    service = RagService(embeddings, llm, limits=ModelLimits(default=model_concurrency),
+                         max_batch=max_batch)
+    service.add_app(APPS["legal"], load_app_index(APPS["legal"], embeddings))
+
+    async def serve():
+        runner = web.AppRunner(service.web_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        connection.send(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/apps/legal/ask")
+        await asyncio.to_thread(connection.recv)
+        connection.send(service.stats())
+        await runner.cleanup()
+
+    asyncio.run(serve())
+
+
+def run_baseline(vector_store, base_url, questions, concurrency):
+    # The scripts' clients: OpenAIEmbeddings for queries and a sync chain per session
+    embeddings = OpenAIEmbeddings(api_key="fake", base_url=base_url, check_embedding_ctx_length=False)
+    store = FAISS(embedding_function=embeddings, index=vector_store.index, docstore=vector_store.docstore,
+                  index_to_docstore_id=vector_store.index_to_docstore_id)
+    llm = ChatOpenAI(model="gpt-4o", api_key="fake", base_url=base_url)
+    chain = app_chain(APPS["legal"], llm, app_retriever(APPS["legal"], store))
+
+    def ask(question):
+        start = time.perf_counter()
+        chain.invoke({"input": question, "chat_history": []})
+        return time.perf_counter() - start
+
+    ask(questions[0])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(ask, questions))
+    return latencies, time.perf_counter() - start
+
+
+async def load_service(url, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession() as session:
+        async def ask(question):
+            async with semaphore:
+                start = time.perf_counter()
+                async with session.post(url, json={"question": question}) as response:
+                    response.raise_for_status()
+                    await response.json()
+                return time.perf_counter() - start
+
+        await ask(questions[0])
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[ask(question) for question in questions])
+        return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients (sessions)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per upstream request")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="mock seconds between streamed tokens")
+    parser.add_argument("--model-concurrency", type=int, default=32, help="service cap per upstream model")
+    parser.add_argument("--max-batch", type=int, default=64, help="service queries per embedding and search batch")
+    args = parser.parse_args()
+    questions = make_questions(args.requests)
+
+    # Spawned rather than forked, so the children don't inherit this process's clients and their loops
+    context = multiprocessing.get_context("spawn")
+    fake, fake_process = context.Pipe()
+    process = context.Process(target=serve_fake, args=(fake_process,), daemon=True,
+                                      kwargs=dict(size=256, latency=args.latency, reply_tokens=40,
+                                                  token_latency=args.token_latency))
+    process.start()
+    base_url = fake.recv()
+    print(f"{'mode':>8} {'seconds':>8} {'req/sec':>8} {'p50':>7} {'p95':>7} {'embed calls':>12} {'chat calls':>11}")
+
+    # Indexing and one warm-up question each (clients, connections) are left out of the timings and call counts
+    for mode in ["script", "service"]:
+        if mode == "script":
+            embeddings = EmbeddingExecutor(api_key="fake", base_url=base_url, count_tokens=approximate_tokens)
+            vector_store = load_app_index(APPS["legal"], embeddings)
+            fake.send(True)
+            before = fake.recv()
+            latencies, seconds = run_baseline(vector_store, base_url, questions, args.concurrency)
+        else:
+            service, service_process = context.Pipe()
+            process = context.Process(target=serve_service, daemon=True,
+                                              args=(service_process, base_url, args.model_concurrency,
+                                                    args.max_batch))
+            process.start()
+            url = service.recv()
+            fake.send(True)
+            before = fake.recv()
+            latencies, seconds = asyncio.run(load_service(url, questions, args.concurrency))
+            service.send(True)
+            stats = service.recv()
+            process.join()
+        fake.send(True)
+        after = fake.recv()
+        p50, p95 = percentiles(latencies)
+        embed_calls = after["/embeddings"] - before.get("/embeddings", 0) - 1
+        chat_calls = after["/chat/completions"] - before.get("/chat/completions", 0) - 1
+        print(f"{mode:>8} {seconds:8.2f} {len(questions) / seconds:8.1f} {p50:7.3f} {p95:7.3f} "
+              f"{embed_calls:12d} {chat_calls:11d}")
+    fake.send(False)
+
+    print(f"Service batching: {stats['query_embeddings']['mean_batch_size']:.1f} queries per embedding call, "
+          f"{stats['searches']['legal']['mean_batch_size']:.1f} per FAISS search; "
+          f"peak in flight per model: { {m: s['peak'] for m, s in stats['models'].items()} }")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Crash-and-resume bulk ingestion versus a clean run, with a fake embedder that fails on purpose
+
+Checks that the resumed index is identical to the clean one and that no batch
+was embedded twice.
+Usage: python benchmarks/resume_ingestion.py --copies 8 --fail-every 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from common.bulk_ingest import ingest
+from common.fakes import DeterministicEmbeddings, FakeEmbeddingError, FlakyEmbeddings
+from common.index_store import load_index
+from parallel_loading import make_corpus
+
+
+def index_contents(path, embeddings, chunk_size, chunk_overlap):
+    store = load_index(path, embeddings, chunk_size, chunk_overlap)
+    ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+    documents = [(store.docstore.search(i).page_content, store.docstore.search(i).metadata) for i in ids]
+    return ids, documents, store.index.reconstruct_n(0, store.index.ntotal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=8, help="files per format")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--fail-every", type=int, default=5, help="crash after this many batches per attempt")
+    args = parser.parse_args()
+    embeddings = DeterministicEmbeddings(256)
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = os.path.join(folder, "corpus")
+        os.makedirs(corpus)
+        make_corpus(corpus, args.copies)
+
+        clean = FlakyEmbeddings(embeddings)
+        report = ingest([corpus], os.path.join(folder, "clean"), clean, 1000, 100,
+                        batch_size=args.batch_size, index_type="flat")
+        print(f"Clean run: {report['chunks']} chunks in {clean.calls} batches, {report['seconds']:.1f}s")
+
+        attempts, calls = 0, 0
+        while True:
+            attempts += 1
+            flaky = FlakyEmbeddings(embeddings, fail_after=args.fail_every)
+            try:
+                report = ingest([corpus], os.path.join(folder, "resumed"), flaky, 1000, 100,
+                                batch_size=args.batch_size, index_type="flat")
+                calls += flaky.calls
+                break
+            except FakeEmbeddingError:
+                calls += flaky.calls
+        print(f"Resumed run: {attempts} attempts ({attempts - 1} crashes), {calls} batches embedded in total")
+
+        expected = index_contents(os.path.join(folder, "clean"), embeddings, 1000, 100)
+        resumed = index_contents(os.path.join(folder, "resumed"), embeddings, 1000, 100)
+        assert expected[0] == resumed[0], "chunk ids differ"
+        assert expected[1] == resumed[1], "documents differ"
+        assert np.array_equal(expected[2], resumed[2]), "vectors differ"
+        assert calls == clean.calls, "some batches were embedded more than once"
+        assert not os.path.exists(os.path.join(folder, "resumed.checkpoint"))
+        print("Resumed index is identical to the clean run")
+
+
+if __name__ == "__main__":
+    main()
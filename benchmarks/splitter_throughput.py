@@ -0,0 +1,68 @@
+"""RecursiveCharacterTextSplitter versus the offset-tracking OffsetTextSplitter
+
+Checks both produce identical chunks on the bundled corpora, then times them
+on scaled-up copies.
+Usage: python benchmarks/splitter_throughput.py --megabytes 50
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from common.splitter import OffsetTextSplitter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPORA = ["Legal_Document_Analysis_Data.txt", "product-data.txt"]
+
+
+def read_corpus(name):
+    with open(os.path.join(ROOT, "rag", name), encoding="utf-8") as f:
+        return f.read()
+
+
+def verify(text, chunk_size, chunk_overlap):
+    expected = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(text)
+    spans = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_spans(text)
+    assert expected == [text[start:end] for start, end in spans], "chunks differ"
+    return len(spans)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    for name in CORPORA:
+        text = read_corpus(name)
+        for chunk_size, chunk_overlap in [(args.chunk_size, args.chunk_overlap), (200, 20)]:
+            count = verify(text, chunk_size, chunk_overlap)
+            print(f"{name}: {count} identical chunks at chunk_size={chunk_size}, overlap={chunk_overlap}")
+
+    for name in CORPORA:
+        text = read_corpus(name)
+        text = text * (args.megabytes * 2**20 // len(text) + 1)
+        documents = [Document(page_content=text, metadata={"source": name})]
+        size = len(text) / 2**20
+        baseline = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        splitter = OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        recursive, expected = timed(lambda: baseline.split_documents(documents))
+        offsets, chunks = timed(lambda: splitter.split_documents(documents))
+        spans, _ = timed(lambda: splitter.split_spans(text))
+        assert [d.page_content for d in expected] == [d.page_content for d in chunks]
+        print(f"{name} x{size:.0f} MB, {len(chunks)} chunks: recursive {size / recursive:.1f} MB/s, "
+              f"offset documents {size / offsets:.1f} MB/s, offsets only {size / spans:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
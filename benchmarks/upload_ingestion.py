@@ -0,0 +1,83 @@
+"""Temp-file upload handling versus parsing straight from the upload buffer
+
+Usage: python benchmarks/upload_ingestion.py --pages 2000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from pypdf import PdfReader, PdfWriter
+from common.loaders import load_upload
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def large_pdf(pages):
+    source = PdfReader(os.path.join(ROOT, "rag", "academic_research_data.pdf"))
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(source.pages[i % len(source.pages)])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def large_text(megabytes):
+    with open(os.path.join(ROOT, "rag", "Legal_Document_Analysis_Data.txt"), "rb") as f:
+        text = f.read()
+    return text * (megabytes * 2**20 // len(text) + 1)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def temp_file_load(data, suffix, loader):
+    # What the apps used to do: write the upload out, then re-read it from disk
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, f"temp{suffix}")
+        with open(path, "wb") as f:
+            f.write(data)
+        return loader(path).load()
+
+
+def disk_round_trip(data):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "temp.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--text-mb", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, data, suffix, loader in [
+        (f"{args.pages}-page PDF", large_pdf(args.pages), ".pdf", PyPDFLoader),
+        (f"{args.text_mb} MB TXT", large_text(args.text_mb), ".txt", TextLoader),
+    ]:
+        buffer = memoryview(data)
+        size = len(data) / 2**20
+        round_trip, _ = timed(lambda: disk_round_trip(data))
+        on_disk, documents = timed(lambda: temp_file_load(data, suffix, loader))
+        in_memory, streamed = timed(lambda: load_upload(buffer, f"upload{suffix}"))
+        assert sum(map(len, (d.page_content for d in documents))) == sum(map(len, (d.page_content for d in streamed)))
+        print(f"{name} ({size:.2f} MB): temp file {on_disk:.2f}s, in-memory {in_memory:.2f}s, "
+              f"disk round trip alone {round_trip * 1000:.0f} ms ({size / round_trip:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
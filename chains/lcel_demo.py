@@ -1,7 +1,10 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import streamlit as st
+from common.streaming import TextStream
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
@@ -30,10 +33,11 @@ budget = st.selectbox("Travel Budget", ["Low", "Medium", "High"])
 chain = prompt_template | llm
 
 if city and month and language and budget:
-    response = chain.invoke({
+    guide = TextStream(chain.stream({
         "city":city,
         "month":month,
         "language":language,
         "budget":budget
-    })
-    st.write(response.content)
\ No newline at end of file
+    }), name="lcel_demo")
+    st.write_stream(guide)
+    st.caption(guide.summary())
\ No newline at end of file
@@ -1,9 +1,12 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import streamlit as st
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 import datetime
+from common.llm_cache import get_response_cache
 
 # account for deprecation of LLM model
 # Get the current date
@@ -20,7 +23,7 @@ else:
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-llm = ChatOpenAI(model = llm_model, temperature=0.0, api_key=OPENAI_API_KEY)
+llm = ChatOpenAI(model = llm_model, temperature=0.0, api_key=OPENAI_API_KEY, cache=get_response_cache())
 
 # Define the PromptTemplates
 product_prompt = PromptTemplate(
@@ -1,8 +1,12 @@
 import os
+import sys
+import uuid
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.chat_message_histories.in_memory import ChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.chat_history import get_history_store
+from common.history_window import HistoryCompactor
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
@@ -18,21 +22,29 @@ prompt_template = ChatPromptTemplate.from_messages(
 
 chain = prompt_template | llm
 
-history_for_chain = ChatMessageHistory()
+history_store = get_history_store()
+# Older turns are summarized in the background so the prompt stays within a fixed history budget
+history_compactor = HistoryCompactor(llm, history_store, max_tokens=1000)
+# Set CHAT_SESSION_ID to pick up an earlier conversation where it left off
+session_id = os.getenv("CHAT_SESSION_ID") or uuid.uuid4().hex
 
 chain_with_history = RunnableWithMessageHistory(
     chain,
-    lambda session_id:history_for_chain,
+    history_compactor.history,
     input_messages_key="question",
     history_messages_key="chat_history"
 )
 
 print("Agile Guide")
+print(f"Session {session_id} ({history_store.count(session_id)} earlier messages)")
 while True:
     question = input("Enter the question: ")
     if question:
         response = chain_with_history.invoke({
             "question":question},
-            {"configurable":{"session_id":"abc123"}
+            {"configurable":{"session_id":session_id}
         })
         print(response.content)
+        history_report = history_compactor.last_report(session_id)
+        print(f"(history: {history_report['prompt_tokens']} prompt tokens, "
+              f"{history_report['saved_tokens']} saved by summarizing older turns)")
@@ -0,0 +1 @@
+"""Shared helpers used by the rag/, use_case/ and embeddings/ scripts"""
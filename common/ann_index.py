@@ -0,0 +1,92 @@
+import math
+import uuid
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+FLAT_MAX = 50_000
+HNSW_MAX = 1_000_000
+
+
+def choose_index_type(count: int) -> str:
+    """Exact search for small corpora, HNSW for mid-sized, IVF beyond that"""
+    if count <= FLAT_MAX:
+        return "flat"
+    if count <= HNSW_MAX:
+        return "hnsw"
+    return "ivf"
+
+
+def default_params(kind: str, count: int) -> dict:
+    if kind == "hnsw":
+        return {"m": 32, "ef_construction": 200, "ef_search": 128}
+    if kind == "ivf":
+        nlist = max(1, min(int(4 * math.sqrt(count)), count // 39))
+        return {"nlist": nlist, "nprobe": max(1, nlist // 32)}
+    return {}
+
+
+def build_index(vectors: np.ndarray, kind: str = "auto", **params) -> faiss.Index:
+    """Build an L2 FAISS index of the given kind, matching FAISS.from_documents' metric"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    if kind == "auto":
+        kind = choose_index_type(count)
+    params = {**default_params(kind, count), **params}
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+    elif kind == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, params["nlist"])
+        # k-means only needs a sample; ~256 points per centroid is plenty
+        sample = vectors
+        if count > 256 * params["nlist"]:
+            sample = vectors[np.random.default_rng(0).choice(count, 256 * params["nlist"], replace=False)]
+        index.train(sample)
+        index.nprobe = params["nprobe"]
+    else:
+        raise ValueError(f"Unknown index type {kind!r}; use flat, hnsw, ivf or auto")
+    index.add(vectors)
+    return index
+
+
+def from_documents(documents: List[Document], embeddings: Embeddings, kind: str = "auto",
+                   ids: Optional[List[str]] = None, **params) -> FAISS:
+    """Drop-in for FAISS.from_documents that picks the index type by corpus size
+
+    The result is a regular langchain FAISS store, so .as_retriever() and
+    save_local()/load_local() work unchanged.
+    """
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]),
+                         dtype=np.float32)
+    return from_embeddings(documents, vectors, embeddings, kind, ids, **params)
+
+
+def from_embeddings(documents: List[Document], vectors: np.ndarray, embeddings: Embeddings,
+                    kind: str = "auto", ids: Optional[List[str]] = None, **params) -> FAISS:
+    index = build_index(vectors, kind, **params)
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, documents))),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def set_search_params(vector_store: FAISS, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Tune recall/latency of a built store at query time"""
+    index = vector_store.index
+    if nprobe is not None and hasattr(index, "nprobe"):
+        index.nprobe = nprobe
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
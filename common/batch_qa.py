@@ -0,0 +1,200 @@
+"""Answer a JSONL file of questions with bounded concurrency, streaming results to JSONL as they finish
+
+Usage: python common/batch_qa.py questions.jsonl --out answers.jsonl --app legal [--max-concurrency 16]
+
+Each input line is {"question": ..., "id": optional}; lines without an id are
+numbered from 1, and lines that are not valid questions get an error line in
+the output. Questions run through the app's chain from rag_apps, served as in
+the RAG service, so concurrent questions share batched embedding calls and
+FAISS searches. Every result is appended and flushed as soon as it completes;
+rerunning the same command skips ids already answered and retries failures.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.rag_apps import APPS
+from common.rag_service import ServedApp
+
+
+def read_questions(path: str) -> Iterator[dict]:
+    """Question records with an id; a line that is not a question yields its id and an "error" instead"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"id": number, "error": f"invalid JSON: {e}"}
+                continue
+            if isinstance(record, str):
+                record = {"question": record}
+            if not isinstance(record, dict):
+                yield {"id": number, "error": "expected an object or a string"}
+                continue
+            record.setdefault("id", number)
+            if not isinstance(record.get("question"), str) or not record["question"].strip():
+                yield {"id": record["id"], "error": "expected a non-empty string 'question'"}
+                continue
+            yield record
+
+
+def answered_ids(path: str) -> Set[str]:
+    """Ids with an answer in a previous run's output; a torn last line is ignored"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "answer" in record:
+                done.add(str(record["id"]))
+    return done
+
+
+def latency_percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"p50_seconds": None, "p95_seconds": None}
+    return {"p50_seconds": latencies[len(latencies) // 2],
+            "p95_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]}
+
+
+async def run_batch(app: ServedApp, questions: Iterable[dict], out: str, max_concurrency: int = 8,
+                    on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Answer `questions` with at most max_concurrency in flight, appending each result to `out`"""
+    start = time.perf_counter()
+    done = answered_ids(out)
+    # A crash can leave half a line; start on a fresh one so the next record parses
+    if os.path.exists(out) and os.path.getsize(out):
+        with open(out, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+    else:
+        torn = False
+    report = {"answered": 0, "errors": 0, "skipped": 0}
+    latencies = []
+    # Bounded, so a huge input file is read as workers free up rather than all at once
+    queue = asyncio.Queue(maxsize=max_concurrency * 2)
+
+    with open(out, "a", encoding="utf-8") as output:
+        if torn:
+            output.write("\n")
+
+        async def worker():
+            while True:
+                record = await queue.get()
+                if record is None:
+                    return
+                timings, pieces, final = {}, [], {}
+                result = {"id": record["id"], "question": record.get("question")}
+                try:
+                    if "error" in record:
+                        raise ValueError(record["error"])
+                    async for piece in app.answer(record["question"], None, timings, stream=False):
+                        if isinstance(piece, dict):
+                            final = piece
+                        else:
+                            pieces.append(piece)
+                    result.update(answer="".join(pieces), **final)
+                    report["answered"] += 1
+                    latencies.append(timings["seconds"])
+                except Exception as e:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    report["errors"] += 1
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                if on_progress:
+                    on_progress({**report, "seconds": time.perf_counter() - start})
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+
+        async def put(record):
+            # Workers only stop early by failing (e.g. the output disk is full); raise their
+            # error rather than wait forever for room in a queue nobody is draining
+            if not queue.full():
+                queue.put_nowait(record)
+                return
+            putting = asyncio.ensure_future(queue.put(record))
+            await asyncio.wait([putting, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in workers:
+                if task.done():
+                    putting.cancel()
+                    task.result()
+                    raise RuntimeError("a worker stopped before the input was finished")
+
+        try:
+            for record in questions:
+                if str(record["id"]) in done:
+                    report["skipped"] += 1
+                    continue
+                await put(record)
+            for _ in workers:
+                await put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    seconds = time.perf_counter() - start
+    return {**report, "seconds": seconds,
+            "questions_per_second": report["answered"] / seconds if seconds else 0.0,
+            **latency_percentiles(latencies)}
+
+
+def main():
+    from langchain_openai import ChatOpenAI
+    from common.embedding_executor import EmbeddingExecutor
+    from common.rag_service import ModelLimits, build_service
+    from common.token_budget import local_token_counter
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", help="JSONL file of {\"question\": ..., \"id\": ...}")
+    parser.add_argument("--out", required=True, help="JSONL file to append answers to")
+    parser.add_argument("--app", choices=sorted(APPS), default="legal")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="questions in flight at once")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--embedding-model", default="text-embedding-ada-002")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"),
+                        help="OpenAI-compatible endpoint, e.g. a local mock")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    embeddings = EmbeddingExecutor(model=args.embedding_model, api_key=api_key, base_url=args.base_url,
+                                   count_tokens=local_token_counter(), keep_client=True)
+    llm = ChatOpenAI(model=args.model, api_key=api_key, base_url=args.base_url)
+    service = build_service([args.app], embeddings, llm, limits=ModelLimits(default=args.max_concurrency))
+    if args.app not in service.apps:
+        sys.exit(f"Cannot load app {args.app}")
+
+    def progress(report):
+        total = report["answered"] + report["errors"]
+        if total % 50 == 0:
+            print(f"{total} done ({report['errors']} errors), "
+                  f"{report['answered'] / report['seconds']:.1f} questions/sec")
+
+    try:
+        report = asyncio.run(run_batch(service.apps[args.app], read_questions(args.questions), args.out,
+                                       args.max_concurrency, on_progress=progress))
+    except KeyboardInterrupt:
+        print(f"Stopped; rerun the same command to resume, {args.out} keeps every finished answer")
+        sys.exit(1)
+    p50 = "n/a" if report["p50_seconds"] is None else f"{report['p50_seconds']:.2f}s"
+    p95 = "n/a" if report["p95_seconds"] is None else f"{report['p95_seconds']:.2f}s"
+    print(f"Answered {report['answered']} questions ({report['errors']} errors, {report['skipped']} already done) "
+          f"in {report['seconds']:.1f}s: {report['questions_per_second']:.1f} questions/sec, p50 {p50}, p95 {p95}")
+    if report["errors"]:
+        print("Rerun the same command to retry the failed questions")
+
+
+if __name__ == "__main__":
+    main()
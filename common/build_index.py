@@ -0,0 +1,67 @@
+"""Ingest a corpus once and save its FAISS or quantized index, documents and manifest
+
+Usage: python common/build_index.py rag/Legal_Document_Analysis_Data.txt \
+           --out rag/indexes/legal --chunk-size 1000 --chunk-overlap 200 [--store int8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ann_index import from_documents
+from common.embedding_cache import CachedEmbeddings
+from common.embedding_executor import EmbeddingExecutor
+from common.fakes import DeterministicEmbeddings
+from common.index_store import expand_sources, save_index
+from common.loaders import load_files_parallel
+from common.quantized_store import DTYPES, QuantizedVectorStore
+from common.token_budget import make_splitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="files or folders (.txt, .pdf, .docx)")
+    parser.add_argument("--out", required=True, help="folder to write the index to")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--chunk-unit", choices=["chars", "tokens"], default="chars",
+                        help="measure --chunk-size/--chunk-overlap in characters or tokens")
+    parser.add_argument("--model", default="text-embedding-ada-002")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="file loading processes (default: CPU count)")
+    parser.add_argument("--index-type", choices=["auto", "flat", "hnsw", "ivf"], default="auto",
+                        help="auto picks exact search for small corpora and HNSW/IVF for large ones")
+    parser.add_argument("--store", choices=["faiss"] + sorted(DTYPES), default="faiss",
+                        help="faiss, or a memory-mapped QuantizedVectorStore with int8/float16 codes")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use deterministic local vectors (for testing without an API key)")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        embeddings = DeterministicEmbeddings()
+    else:
+        embeddings = CachedEmbeddings(EmbeddingExecutor(model=args.model, max_concurrency=args.concurrency))
+
+    start = time.perf_counter()
+    sources = expand_sources(args.sources)
+    documents, report = load_files_parallel(sources, max_workers=args.workers)
+    for entry in report:
+        if entry["error"]:
+            print(f"Error loading {entry['path']}: {entry['error']}")
+    splitter = make_splitter(args.chunk_size, args.chunk_overlap, args.chunk_unit)
+    chunks = splitter.split_documents(documents)
+    if args.store == "faiss":
+        vector_store = from_documents(chunks, embeddings, kind=args.index_type)
+    else:
+        vector_store = QuantizedVectorStore.from_texts([chunk.page_content for chunk in chunks], embeddings,
+                                                       [chunk.metadata for chunk in chunks], path=args.out,
+                                                       dtype=args.store)
+    manifest = save_index(vector_store, args.out, sources, embeddings, args.chunk_size, args.chunk_overlap,
+                          args.chunk_unit)
+    print(f"Indexed {len(sources)} files into {manifest['chunks']} chunks at {args.out} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Resumable bulk ingestion: checkpoint every embedded batch and pick up where a crash left off
+
+Usage: python common/bulk_ingest.py <folder> --out <folder>/index [--restart]
+
+Progress lives in <out>.checkpoint/ until the index is complete: a state file
+with the files done and chunks embedded so far, plus one shard (vectors and
+documents) per embedded batch. Re-running the same command after a crash,
+rate-limit storm or Ctrl-C embeds only what is missing, and the final index
+is the same as an uninterrupted run's.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Callable, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from common.ann_index import from_embeddings
+from common.index_store import expand_sources, file_sha256, index_settings, save_index
+from common.loaders import load_source
+from common.token_budget import make_splitter
+
+STATE_NAME = "state.json"
+# Shared by ingest() and the CLI so both produce the same index for the same sources
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+class CheckpointMismatchError(ValueError):
+    """The checkpoint was written with other settings or source contents than this run's"""
+
+
+def _write_atomic(path: str, write: Callable):
+    # A crash mid-write leaves only the .tmp file behind, never a torn checkpoint
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+class Checkpoint:
+    """State file plus numbered shards under one folder"""
+
+    def __init__(self, path: str, config: dict, restart: bool = False):
+        self.path = path
+        if restart and os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+        state_path = os.path.join(path, STATE_NAME)
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                self.state = json.load(f)
+            if self.state["config"] != config:
+                raise CheckpointMismatchError(
+                    f"Checkpoint at {path} was written with different settings; "
+                    f"rerun with --restart to discard it"
+                )
+        else:
+            self.state = {"config": config, "files": {}, "shards": []}
+
+    def check_sources(self, hashes: dict):
+        """Refuse to mix in vectors from files that changed or were dropped since they were embedded"""
+        for source, progress in self.state["files"].items():
+            if progress["embedded"] and hashes.get(source) != progress["sha256"]:
+                raise CheckpointMismatchError(
+                    f"{source} changed or is no longer a source since it was checkpointed; "
+                    f"rerun with --restart to discard the checkpoint"
+                )
+        for source, sha256 in hashes.items():
+            self.file(source)["sha256"] = sha256
+
+    def file(self, source: str) -> dict:
+        return self.state["files"].setdefault(source, {"chunks": None, "embedded": 0, "done": False})
+
+    def add_shard(self, source: str, offset: int, vectors: np.ndarray, documents: List[Document],
+                  ids: List[str]):
+        name = f"shard-{len(self.state['shards']):06d}"
+        _write_atomic(os.path.join(self.path, name + ".npy"), lambda f: np.save(f, vectors))
+        _write_atomic(os.path.join(self.path, name + ".jsonl"), lambda f: f.writelines(
+            json.dumps({"id": i, "page_content": d.page_content, "metadata": d.metadata}).encode("utf-8") + b"\n"
+            for i, d in zip(ids, documents)))
+        self.state["shards"].append({"name": name, "source": source, "offset": offset,
+                                     "chunks": len(documents)})
+        self.file(source)["embedded"] += len(documents)
+        self.save()
+
+    def save(self):
+        _write_atomic(os.path.join(self.path, STATE_NAME),
+                      lambda f: f.write(json.dumps(self.state, indent=2).encode("utf-8")))
+
+    def read_shards(self, sources: List[str]):
+        """All checkpointed (documents, ids, vectors) in source order, however the runs interleaved"""
+        position = {source: n for n, source in enumerate(sources)}
+        documents, ids, vectors = [], [], []
+        for shard in sorted(self.state["shards"], key=lambda shard: (position[shard["source"]], shard["offset"])):
+            vectors.append(np.load(os.path.join(self.path, shard["name"] + ".npy")))
+            with open(os.path.join(self.path, shard["name"] + ".jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    documents.append(Document(page_content=record["page_content"], metadata=record["metadata"]))
+        return documents, ids, vectors
+
+
+def ingest(sources: List[str], out: str, embeddings: Embeddings, chunk_size: int = DEFAULT_CHUNK_SIZE,
+           chunk_overlap: int = DEFAULT_CHUNK_OVERLAP, chunk_unit: str = "chars", batch_size: int = 256,
+           index_type: str = "auto", restart: bool = False,
+           on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Load, split and embed `sources` into a FAISS index at `out`, checkpointing each batch
+
+    Files that fail to load are skipped and reported; an embedding failure
+    propagates with all finished batches already checkpointed.
+    """
+    start = time.perf_counter()
+    sources = expand_sources(sources)
+    config = index_settings(embeddings, chunk_size, chunk_overlap, chunk_unit)
+    checkpoint = Checkpoint(out.rstrip("/\\") + ".checkpoint", config, restart)
+    checkpoint.check_sources({source: file_sha256(source) for source in sources})
+    splitter = make_splitter(chunk_size, chunk_overlap, chunk_unit)
+    resumed = sum(shard["chunks"] for shard in checkpoint.state["shards"])
+    errors = {}
+
+    for number, source in enumerate(sources, start=1):
+        progress = checkpoint.file(source)
+        if progress["done"]:
+            continue
+        try:
+            documents = load_source(source)
+        except Exception as e:
+            errors[source] = f"{type(e).__name__}: {e}"
+            continue
+        # Splitting is deterministic, so the chunks already embedded are a prefix
+        chunks = splitter.split_documents(documents)
+        progress["chunks"] = len(chunks)
+        for offset in range(progress["embedded"], len(chunks), batch_size):
+            batch = chunks[offset:offset + batch_size]
+            vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in batch]),
+                                 dtype=np.float32)
+            ids = [f"{source}:{n}" for n in range(offset, offset + len(batch))]
+            checkpoint.add_shard(source, offset, vectors, batch, ids)
+            if on_progress:
+                on_progress({"file": source, "files_done": number - 1, "files": len(sources),
+                             "embedded": progress["embedded"], "chunks": len(chunks)})
+        progress["done"] = True
+        checkpoint.save()
+
+    documents, ids, vectors = checkpoint.read_shards(sources)
+    if not documents:
+        raise ValueError("No chunks were produced from the given sources")
+    vector_store = from_embeddings(documents, np.concatenate(vectors), embeddings, index_type, ids)
+    loaded = [source for source in sources if source not in errors]
+    manifest = save_index(vector_store, out, loaded, embeddings, chunk_size, chunk_overlap, chunk_unit)
+    if not errors:
+        # Keep the checkpoint when files failed so a rerun only retries those
+        shutil.rmtree(checkpoint.path)
+    return {"files": len(sources), "chunks": manifest["chunks"], "resumed_chunks": resumed,
+            "errors": errors, "seconds": time.perf_counter() - start}
+
+
+def main():
+    from common.embedding_cache import CachedEmbeddings
+    from common.embedding_executor import EmbeddingExecutor
+    from common.fakes import DeterministicEmbeddings, FlakyEmbeddings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="files or folders (.txt, .pdf, .docx)")
+    parser.add_argument("--out", required=True, help="folder to write the index to")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument("--chunk-unit", choices=["chars", "tokens"], default="chars")
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks per embedding call and checkpoint")
+    parser.add_argument("--model", default="text-embedding-ada-002")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--index-type", choices=["auto", "flat", "hnsw", "ivf"], default="auto")
+    parser.add_argument("--restart", action="store_true", help="discard any checkpoint and start over")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use deterministic local vectors (for testing without an API key)")
+    parser.add_argument("--fail-after", type=int,
+                        help="with --fake-embeddings, fail after this many batches to test resuming")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        embeddings = FlakyEmbeddings(DeterministicEmbeddings(), fail_after=args.fail_after)
+    else:
+        embeddings = CachedEmbeddings(EmbeddingExecutor(model=args.model, max_concurrency=args.concurrency))
+
+    try:
+        report = ingest(args.sources, args.out, embeddings, args.chunk_size, args.chunk_overlap,
+                        args.chunk_unit, args.batch_size, args.index_type, args.restart,
+                        on_progress=lambda p: print(f"[{p['files_done'] + 1}/{p['files']}] {p['file']}: "
+                                                    f"{p['embedded']}/{p['chunks']} chunks embedded"))
+    except (Exception, KeyboardInterrupt) as e:
+        print(f"Stopped ({type(e).__name__}: {e}); rerun the same command to resume from the checkpoint")
+        sys.exit(1)
+    for source, error in report["errors"].items():
+        print(f"Error loading {source}: {error}")
+    print(f"Indexed {report['files'] - len(report['errors'])} files into {report['chunks']} chunks at {args.out} "
+          f"({report['resumed_chunks']} chunks resumed from checkpoint) in {report['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+DEFAULT_HISTORY_PATH = os.getenv(
+    "CHAT_HISTORY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "chat_history.sqlite"),
+)
+
+
+class _HotSession:
+    __slots__ = ("tail", "next_seq", "last_active")
+
+    def __init__(self, tail: deque, next_seq: int):
+        self.tail = tail
+        self.next_seq = next_seq
+        self.last_active = time.time()
+
+
+class SessionHistoryStore:
+    """Append-only SQLite chat log per session, with the recent tail of hot sessions in memory
+
+    Each message is one INSERT keyed by (session_id, seq), so appending costs the
+    same on turn 5 and turn 5000, and the chain only ever reads the last
+    `tail_messages` messages, served from memory for sessions in the LRU.
+    At most `hot_sessions` sessions stay in memory; sessions idle for longer
+    than `idle_seconds` are evicted too. Nothing is lost on eviction or
+    restart: the next access reloads the tail from disk.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, tail_messages: int = 50,
+                 hot_sessions: int = 256, idle_seconds: float = 1800):
+        self.tail_messages = tail_messages
+        self.hot_sessions = hot_sessions
+        self.idle_seconds = idle_seconds
+        self.loads = 0
+        self.evictions = 0
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages (session_id TEXT NOT NULL, seq INTEGER NOT NULL, "
+            "message TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, covered INTEGER NOT NULL, "
+            "summary TEXT NOT NULL, source_tokens INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _session(self, session_id: str) -> _HotSession:
+        """Hot entry for a session, loading its tail from disk on a miss; caller holds the lock"""
+        session = self._hot.get(session_id)
+        if session is None:
+            rows = self._conn.execute(
+                "SELECT seq, message FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, self.tail_messages),
+            ).fetchall()
+            tail = deque(messages_from_dict([json.loads(message) for _, message in reversed(rows)]),
+                         maxlen=self.tail_messages)
+            session = self._hot[session_id] = _HotSession(tail, rows[0][0] + 1 if rows else 0)
+            self.loads += 1
+        self._hot.move_to_end(session_id)
+        session.last_active = time.time()
+        self._evict()
+        return session
+
+    def _evict(self):
+        while len(self._hot) > self.hot_sessions:
+            self._hot.popitem(last=False)
+            self.evictions += 1
+        now = time.time()
+        if now - self._last_sweep < min(60.0, self.idle_seconds):
+            return
+        self._last_sweep = now
+        # The LRU is ordered by last use, so idle sessions are all at the front
+        while self._hot:
+            session_id, session = next(iter(self._hot.items()))
+            if now - session.last_active < self.idle_seconds:
+                break
+            del self._hot[session_id]
+            self.evictions += 1
+
+    def tail(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            return list(self._session(session_id).tail)
+
+    def snapshot(self, session_id: str) -> Tuple[int, List[BaseMessage]]:
+        """The in-memory tail and the seq of its first message"""
+        with self._lock:
+            session = self._session(session_id)
+            return session.next_seq - len(session.tail), list(session.tail)
+
+    def read(self, session_id: str, start: int, stop: int) -> List[BaseMessage]:
+        """Messages with start <= seq < stop, from disk"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, stop),
+            ).fetchall()
+        return messages_from_dict([json.loads(message) for message, in rows])
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        with self._lock:
+            session = self._session(session_id)
+            now = time.time()
+            rows = []
+            for message in messages:
+                rows.append((session_id, session.next_seq, json.dumps(message_to_dict(message)), now))
+                session.next_seq += 1
+                session.tail.append(message)
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, seq, message, created) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._hot.pop(session_id, None)
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def count(self, session_id: str) -> int:
+        """Messages stored for a session, including those older than the in-memory tail"""
+        with self._lock:
+            return self._session(session_id).next_seq
+
+    def summary(self, session_id: str) -> Optional[Tuple[int, str, int]]:
+        """(covered, summary, source_tokens) of the rolling summary of messages before seq `covered`"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT covered, summary, source_tokens FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+
+    def save_summary(self, session_id: str, covered: int, summary: str, source_tokens: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, covered, summary, source_tokens) VALUES (?, ?, ?, ?)",
+                (session_id, covered, summary, source_tokens),
+            )
+            self._conn.commit()
+
+    def history(self, session_id: str) -> "SessionHistory":
+        return SessionHistory(self, session_id)
+
+
+class SessionHistory(BaseChatMessageHistory):
+    """BaseChatMessageHistory view of one session, for RunnableWithMessageHistory"""
+
+    def __init__(self, store: SessionHistoryStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.store.tail(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+
+@functools.lru_cache(maxsize=None)
+def get_history_store(path: str = DEFAULT_HISTORY_PATH) -> SessionHistoryStore:
+    """One store per path per process, so Streamlit reruns and sessions share the hot LRU"""
+    return SessionHistoryStore(path)
@@ -0,0 +1,98 @@
+import re
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 5) -> np.ndarray:
+    """Stable 32-bit hashes of overlapping word n-grams"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+class MinHasher:
+    """MinHash signatures with LSH banding to find near-duplicate chunks cheaply"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text, self.shingle_size)
+        # (a * x + b) mod p over all shingles at once; uint64 wraps like the reference impl
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+
+def _provenance(doc: Document) -> dict:
+    return {key: doc.metadata[key] for key in ("source", "page") if key in doc.metadata}
+
+
+def iter_deduplicate(chunks: Iterable[Document], threshold: float = 0.85, hasher: MinHasher = None,
+                     report: Optional[dict] = None) -> Iterator[Document]:
+    """Streaming form of deduplicate(), yielding each kept chunk as soon as it is seen
+
+    Provenance of later duplicates is appended to the kept chunk's
+    metadata["sources"] list in place, after it has been yielded.
+    """
+    hasher = hasher or MinHasher()
+    report = report if report is not None else {}
+    report.update(chunks_in=0, chunks_out=0, dropped=0)
+    buckets: Dict[bytes, List[int]] = {}
+    # Only signatures and provenance lists are retained, never chunk text
+    signatures: List[np.ndarray] = []
+    sources_of: List[list] = []
+    for chunk in chunks:
+        report["chunks_in"] += 1
+        signature = hasher.signature(chunk.page_content)
+        keys = hasher.band_keys(signature)
+        match = None
+        for candidate in sorted({i for key in keys for i in buckets.get(key, ())}):
+            if np.mean(signatures[candidate] == signature) >= threshold:
+                match = candidate
+                break
+        if match is None:
+            sources = [_provenance(chunk)]
+            signatures.append(signature)
+            sources_of.append(sources)
+            for key in keys:
+                buckets.setdefault(key, []).append(len(signatures) - 1)
+            report["chunks_out"] += 1
+            yield Document(page_content=chunk.page_content, metadata={**chunk.metadata, "sources": sources})
+        else:
+            sources = sources_of[match]
+            if _provenance(chunk) not in sources:
+                sources.append(_provenance(chunk))
+            report["dropped"] += 1
+
+
+def deduplicate(chunks: List[Document], threshold: float = 0.85,
+                hasher: MinHasher = None) -> Tuple[List[Document], dict]:
+    """Drop chunks whose estimated Jaccard similarity to a kept chunk is >= threshold
+
+    The first occurrence is kept and gains metadata["sources"], listing the
+    provenance of every chunk folded into it, so citations can still point to
+    each file and page the text appeared in.
+    """
+    report = {}
+    kept = list(iter_deduplicate(chunks, threshold, hasher, report))
+    return kept, report
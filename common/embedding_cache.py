@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "embeddings.sqlite"),
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and whitespace so trivially different chunks share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content address of a chunk for a given embedding model"""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Drop-in wrapper that only sends cache misses to the underlying embeddings
+
+    Document vectors are persisted in SQLite keyed by (model, normalized text hash),
+    query vectors are kept in an in-process LRU.
+    """
+
+    def __init__(self, underlying: Embeddings, path: str = DEFAULT_CACHE_PATH,
+                 model: Optional[str] = None, query_cache_size: int = 1024):
+        self.underlying = underlying
+        self.model = model or getattr(underlying, "model", type(underlying).__name__)
+        self.query_cache_size = query_cache_size
+        self.hits = 0
+        self.misses = 0
+        self.query_hits = 0
+        self.query_misses = 0
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        unique = list(set(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model, text) for text in texts]
+        with self._lock:
+            found = self._lookup(keys)
+
+        # Embed each missing key once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes())
+                     for key, vector in zip(missing, vectors)],
+                )
+                self._conn.commit()
+            found.update(zip(missing, vectors))
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model, text)
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                self.query_hits += 1
+                return list(self._queries[key])
+        vector = self.underlying.embed_query(text)
+        with self._lock:
+            self.query_misses += 1
+            self._queries[key] = vector
+            if len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return list(vector)
+
+    @property
+    def stats(self) -> dict:
+        """Hit/miss counters for document and query lookups"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "query_hits": self.query_hits,
+            "query_misses": self.query_misses,
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import random
+import threading
+from typing import Callable, List, Optional
+
+import openai
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError,
+                    openai.APIConnectionError, openai.APITimeoutError)
+
+
+def token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """Return a function counting tokens with a local tiktoken encoding"""
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count_tokens(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    # Lets indexes record which tokenizer sized their chunks
+    count_tokens.encoding = encoding_name
+    return count_tokens
+
+
+def approximate_tokens(text: str) -> int:
+    """Cheap ~4 characters per token estimate for when no tokenizer is available"""
+    return max(1, len(text) // 4)
+
+
+def pack_batches(texts: List[str], max_tokens: int, max_items: int,
+                 count_tokens: Callable[[str], int]) -> List[List[int]]:
+    """Group text indexes into consecutive batches that fit a token budget
+
+    A single text larger than the budget is sent in a batch of its own.
+    """
+    batches, current, current_tokens = [], [], 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error: Exception, attempt: int, base_delay: float, max_delay: float) -> float:
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    # Full jitter so that parallel batches don't retry in lockstep
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class EmbeddingExecutor(Embeddings):
+    """OpenAI embeddings client that packs chunks by token budget and embeds
+    several batches concurrently, retrying on 429/5xx with backoff
+
+    Results are always returned in input order.
+    """
+
+    def __init__(self, model: str = "text-embedding-ada-002", api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, max_tokens_per_batch: int = 20000,
+                 max_items_per_batch: int = 2048, max_concurrency: int = 4,
+                 max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0,
+                 count_tokens: Optional[Callable[[str], int]] = None, keep_client: bool = False):
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_items_per_batch = max_items_per_batch
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.count_tokens = count_tokens or token_counter()
+        self.retries = 0
+        # Long-running event loops (services) reuse one client instead of paying for
+        # a new SSL context and connections on every call
+        self.keep_client = keep_client
+        self._client = None
+        self._client_loop = None
+
+    async def _embed_batch(self, client, texts: List[str], semaphore) -> List[List[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    # The SDK's default base64 transfer decodes in one call; "float" builds a model per number
+                    response = await client.embeddings.create(input=texts, model=self.model)
+                    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    await asyncio.sleep(_retry_delay(e, attempt, self.base_delay, self.max_delay))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = pack_batches(texts, self.max_tokens_per_batch,
+                               self.max_items_per_batch, self.count_tokens)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.keep_client:
+            results = await asyncio.gather(*[
+                self._embed_batch(self._loop_client(), [texts[i] for i in batch], semaphore)
+                for batch in batches
+            ])
+        else:
+            # The SDK's own retries are disabled so that backoff is handled here
+            async with self._new_client() as client:
+                results = await asyncio.gather(*[
+                    self._embed_batch(client, [texts[i] for i in batch], semaphore)
+                    for batch in batches
+                ])
+        vectors = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+        return vectors
+
+    def _new_client(self) -> openai.AsyncOpenAI:
+        return openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+
+    def _loop_client(self) -> openai.AsyncOpenAI:
+        # An async client is bound to the loop it first ran on
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            self._client, self._client_loop = self._new_client(), loop
+        return self._client
+
+    async def aclose(self):
+        """Close the kept client's connections; call it on the loop that used the client"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = self._client_loop = None
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _run(self.aembed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _run(coroutine):
+    """Run a coroutine from sync code, even when the caller already has a loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
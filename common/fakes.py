@@ -0,0 +1,237 @@
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def fake_vector(text: str, size: int = 1536) -> List[float]:
+    """Deterministic unit vector derived from the text's hash"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(size).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class DeterministicEmbeddings(Embeddings):
+    """Local stand-in for OpenAIEmbeddings that never touches the network"""
+
+    def __init__(self, size: int = 1536):
+        self.size = size
+        self.model = f"fake-{size}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [fake_vector(text, self.size) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return fake_vector(text, self.size)
+
+
+class FakeEmbeddingError(RuntimeError):
+    """Raised by FlakyEmbeddings to simulate an API outage"""
+
+
+class FlakyEmbeddings(Embeddings):
+    """Embeddings wrapper that fails on purpose, for exercising crash recovery
+
+    embed_documents raises once `fail_after` calls have succeeded, and otherwise
+    at random with `failure_rate`.
+    """
+
+    def __init__(self, underlying: Embeddings, fail_after: Optional[int] = None,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", None)
+        self.fail_after = fail_after
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise FakeEmbeddingError(f"Simulated failure after {self.calls} calls")
+        if self._random.random() < self.failure_rate:
+            raise FakeEmbeddingError("Simulated random failure")
+        self.calls += 1
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+
+class _BacklogHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection bursts, which then wait a 1s SYN retry
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeOpenAIServer:
+    """OpenAI-compatible HTTP server for local tests and benchmarks
+
+    Serves POST /v1/embeddings with deterministic vectors and
+    /v1/chat/completions with a canned `reply_tokens`-word answer, streamed
+    as SSE chunks `token_latency` apart when the request asks for a stream.
+    `latency` is added to every request and `failure_rate` of requests are
+    answered with 429 or 500. `paths` counts requests per endpoint.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, size: int = 1536,
+                 latency: float = 0.0, failure_rate: float = 0.0, reply_tokens: int = 20,
+                 token_latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reply_tokens = reply_tokens
+        self.token_latency = token_latency
+        self.requests = 0
+        self.failures = 0
+        self.paths = Counter()
+        self._lock = threading.Lock()
+        self._httpd = _BacklogHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API, so clients reuse their pooled connections
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for n, chunk in enumerate(chunks):
+                    if n and server.token_latency:
+                        time.sleep(server.token_latency)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                with server._lock:
+                    server.requests += 1
+                    server.paths[path.rsplit("/v1", 1)[-1]] += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.failure_rate and random.random() < server.failure_rate:
+                    with server._lock:
+                        server.failures += 1
+                    status = random.choice([429, 500])
+                    self._send(status, {"error": {"message": "injected failure", "type": "fake"}})
+                    return
+                if path.endswith("/embeddings"):
+                    self._send(200, server.embeddings_response(request))
+                elif path.endswith("/chat/completions") and request.get("stream"):
+                    self._send_stream(server.chat_chunks(request))
+                elif path.endswith("/chat/completions"):
+                    self._send(200, server.chat_response(request))
+                else:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        return Handler
+
+    def embeddings_response(self, request: dict) -> dict:
+        inputs = request["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_vector(text, self.size)
+            if request.get("encoding_format") == "base64":
+                vector = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(len(text.split()) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def reply(self, request: dict) -> List[str]:
+        """Words of the canned answer, which echoes the start of the last message"""
+        content = request["messages"][-1]["content"] if request.get("messages") else ""
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        words = ["Fake", "answer", "to:"] + content.split()[:8]
+        words += [f"word{n}" for n in range(len(words), self.reply_tokens)]
+        return [word if n == 0 else " " + word for n, word in enumerate(words[:self.reply_tokens])]
+
+    def _usage(self, request: dict, completion_tokens: int) -> dict:
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def chat_response(self, request: dict) -> dict:
+        words = self.reply(request)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)},
+                         "finish_reason": "stop"}],
+            "usage": self._usage(request, len(words)),
+        }
+
+    def chat_chunks(self, request: dict) -> List[dict]:
+        words = self.reply(request)
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "fake")}
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": word} for word in words]
+        chunks = [{**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+        chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunks.append({**base, "choices": [], "usage": self._usage(request, len(words))})
+        return chunks
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,262 @@
+"""Token-budgeted chat history: recent turns verbatim, older ones folded into a rolling summary
+
+HistoryCompactor wraps SessionHistoryStore sessions for RunnableWithMessageHistory.
+Each turn the chain sees the newest turns that fit the budget, preceded by a
+summary of everything older. Summaries are extended incrementally (previous
+summary + newly expired turns) on a background thread and stored per session,
+so no turn waits on a summarization call. acompact() does the same from an
+event loop, folding in a task that calls the model with ainvoke.
+"""
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from common.chat_history import SessionHistoryStore
+from common.token_budget import local_token_counter
+
+# Role and separator tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Progressively summarize a conversation. Extend the current summary with the new lines, "
+         "keeping names, facts, figures, decisions and open questions. Use at most {max_words} words."),
+        ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:"),
+    ]
+)
+
+
+class HistoryCompactor:
+    """Fit a session's history into max_tokens: a rolling summary plus the last keep_turns turns
+
+    summary_tokens of the budget are reserved for the summary. Until a
+    background fold catches up, the turns it is folding stay verbatim in that
+    reserved share rather than disappearing for a turn.
+    """
+
+    def __init__(self, llm: BaseLanguageModel, store: SessionHistoryStore, max_tokens: int = 1000,
+                 summary_tokens: int = 250, keep_turns: int = 4, fold_messages: int = 20,
+                 count_tokens: Optional[Callable[[str], int]] = None, max_workers: int = 2):
+        self.store = store
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_turns = keep_turns
+        self.fold_messages = fold_messages
+        # History repeats every turn, so each message is tokenized once
+        self._count = lru_cache(maxsize=4096)(count_tokens or local_token_counter())
+        self._summarize = SUMMARY_PROMPT | llm | StrOutputParser()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-summary")
+        self._pending: Dict[str, Future] = {}
+        # session -> (messages counted, their tokens), so each message is counted once across turns
+        self._totals = OrderedDict()
+        self._lock = threading.Lock()
+        self.reports = deque(maxlen=1000)
+        self.summaries = 0
+
+    def message_tokens(self, message: BaseMessage) -> int:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        return self._count(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def history(self, session_id: str) -> "CompactedHistory":
+        return CompactedHistory(self, session_id)
+
+    def compact(self, session_id: str) -> List[BaseMessage]:
+        """The messages to send for this turn, scheduling a summary fold if turns expired from the window"""
+        messages, fold_upto = self._window(session_id)
+        if fold_upto is not None:
+            self._schedule(session_id, fold_upto)
+        return messages
+
+    async def acompact(self, session_id: str) -> List[BaseMessage]:
+        """compact() for an event loop: storage is read on a thread and the fold runs as a task on the loop
+
+        The fold calls the model with ainvoke, so an async concurrency limit
+        wrapped around the model also covers summaries.
+        """
+        messages, fold_upto = await asyncio.to_thread(self._window, session_id)
+        if fold_upto is not None:
+            self._schedule(session_id, fold_upto, in_loop=True)
+        return messages
+
+    def _window(self, session_id: str):
+        """This turn's messages, and the seq to fold the summary through (None when it is up to date)"""
+        offset, tail = self.store.snapshot(session_id)
+        tokens = [self.message_tokens(message) for message in tail]
+
+        # Newest first, whole messages only, within the window's share of the budget
+        window_budget = self.max_tokens - self.summary_tokens
+        start, used = len(tail), 0
+        while start > 0 and len(tail) - start < 2 * self.keep_turns and used + tokens[start - 1] <= window_budget:
+            start -= 1
+            used += tokens[start]
+        # Start the window on a question, not on an orphaned answer
+        while start < len(tail) and not isinstance(tail[start], HumanMessage):
+            used -= tokens[start]
+            start += 1
+        window_start = offset + start
+
+        covered, summary, source_tokens = self.store.summary(session_id) or (0, "", 0)
+        messages = tail[start:]
+        prompt_tokens = used
+        fold_upto = None
+        if covered < window_start:
+            fold_upto = window_start
+            # Bridge the turns still being folded, newest first, within the summary's share
+            bridge, bridge_tokens = start, 0
+            while bridge > max(0, covered - offset) and bridge_tokens + tokens[bridge - 1] <= self.summary_tokens:
+                bridge -= 1
+                bridge_tokens += tokens[bridge]
+            messages = tail[bridge:start] + messages
+            prompt_tokens += bridge_tokens
+        if summary:
+            note = SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+            messages = [note] + messages
+            prompt_tokens += self.message_tokens(note)
+
+        baseline = self._total_tokens(session_id, offset, tokens, covered, source_tokens)
+        self.reports.append({
+            "session_id": session_id,
+            "messages": offset + len(tail),
+            "verbatim": len(tail) - start,
+            "baseline_tokens": baseline,
+            "prompt_tokens": prompt_tokens,
+            "saved_tokens": baseline - prompt_tokens,
+            "summary_pending": covered < window_start,
+        })
+        return messages, fold_upto
+
+    def _total_tokens(self, session_id: str, offset: int, tokens: List[int], covered: int,
+                      source_tokens: int) -> int:
+        """Tokens of every message in the session, including those older than the in-memory tail
+
+        Kept as a running total: a turn only counts the messages appended
+        since the last one. The stored summary's source_tokens stand in for
+        everything it covers, so only messages that left the tail unseen
+        since then are read back from disk.
+        """
+        end = offset + len(tokens)
+        with self._lock:
+            counted, total = self._totals.get(session_id, (0, 0))
+        if counted > end:
+            # Cleared and restarted
+            counted, total = 0, 0
+        if covered > counted:
+            counted, total = covered, source_tokens
+        if counted < offset:
+            total += sum(self.message_tokens(message) for message in self.store.read(session_id, counted, offset))
+            counted = offset
+        total += sum(tokens[counted - offset:])
+        with self._lock:
+            self._totals[session_id] = (end, total)
+            self._totals.move_to_end(session_id)
+            while len(self._totals) > 4096:
+                self._totals.popitem(last=False)
+        return total
+
+    def forget(self, session_id: str):
+        """Drop a session's running token total, e.g. after its history is cleared"""
+        with self._lock:
+            self._totals.pop(session_id, None)
+
+    def last_report(self, session_id: str) -> Optional[dict]:
+        return next((report for report in reversed(self.reports) if report["session_id"] == session_id), None)
+
+    def _schedule(self, session_id: str, upto: int, in_loop: bool = False):
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if pending is not None and not pending.done():
+                # One fold per session at a time; the next turn schedules whatever it leaves
+                return
+            if in_loop:
+                future = self._pending[session_id] = asyncio.ensure_future(self._afold(session_id, upto))
+            else:
+                future = self._pending[session_id] = self._executor.submit(self._fold, session_id, upto)
+        future.add_done_callback(lambda done: self._forget(session_id, done))
+
+    def _forget(self, session_id: str, future):
+        with self._lock:
+            if self._pending.get(session_id) is future:
+                del self._pending[session_id]
+
+    def _fold(self, session_id: str, upto: int):
+        steps = self._fold_steps(session_id, upto)
+        request = _advance(steps)
+        while request is not None:
+            request = _advance(steps, self._summarize.invoke(request))
+
+    async def _afold(self, session_id: str, upto: int):
+        steps = self._fold_steps(session_id, upto)
+        request = await asyncio.to_thread(_advance, steps)
+        while request is not None:
+            summary = await self._summarize.ainvoke(request)
+            request = await asyncio.to_thread(_advance, steps, summary)
+
+    def _fold_steps(self, session_id: str, upto: int):
+        """Extend the stored summary through seq `upto`, fold_messages at a time
+
+        A generator that yields each summarization request and is sent the
+        summary back, so _fold and _afold share it and only differ in how
+        they call the model.
+        """
+        covered, summary, source_tokens = self.store.summary(session_id) or (0, "", 0)
+        while covered < upto:
+            stop = min(upto, covered + self.fold_messages)
+            new = self.store.read(session_id, covered, stop)
+            if not new:
+                return
+            summary = yield {
+                "summary": summary or "(none yet)",
+                "new_lines": get_buffer_string(new),
+                "max_words": int(self.summary_tokens * 0.75),
+            }
+            source_tokens += sum(self.message_tokens(message) for message in new)
+            covered = stop
+            if self.store.count(session_id) < covered:
+                # Cleared while we were summarizing
+                return
+            self.store.save_summary(session_id, covered, summary, source_tokens)
+            self.summaries += 1
+
+    def wait(self, session_id: Optional[str] = None):
+        """Block until pending thread-pool summary folds finish (for scripts and benchmarks)"""
+        with self._lock:
+            pending = list(self._pending.values()) if session_id is None else [self._pending.get(session_id)]
+        for future in pending:
+            if isinstance(future, Future):
+                future.result()
+
+
+def _advance(steps, summary: Optional[str] = None) -> Optional[dict]:
+    """Send a fold its last summary; its next request, or None once it is done"""
+    try:
+        return steps.send(summary)
+    except StopIteration:
+        return None
+
+
+class CompactedHistory(BaseChatMessageHistory):
+    """Session history whose messages are the compacted window; appends go to the full log"""
+
+    def __init__(self, compactor: HistoryCompactor, session_id: str):
+        self.compactor = compactor
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.compactor.compact(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.compactor.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.compactor.store.clear(self.session_id)
+        self.compactor.forget(self.session_id)
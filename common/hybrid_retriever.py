@@ -0,0 +1,149 @@
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words; identifiers like SKU-1234 or 4.2(b) also yield their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", match) if part)
+    return tokens
+
+
+class BM25Index:
+    """Compact in-process inverted index with BM25 scoring
+
+    Posting lists are stored CSR-style in flat numpy arrays (term offsets,
+    uint32 doc numbers, uint16 term frequencies) rather than Python lists, so
+    the index costs ~6 bytes per posting.
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        postings: List[array] = []
+        lengths = array("I")
+        for doc_number, text in enumerate(texts):
+            counts: Dict[int, int] = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                term = self.vocabulary.setdefault(token, len(self.vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                if term == len(postings):
+                    postings.append(array("Q"))
+                # Pack (doc, tf) into one integer while building; split on finalize
+                postings[term].append(doc_number << 16 | min(count, 0xFFFF))
+            lengths.append(len(tokens))
+
+        self.doc_lengths = np.frombuffer(lengths, dtype=np.uint32).astype(np.float32)
+        self.average_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(p) for p in postings])
+        packed = np.concatenate([np.frombuffer(p, dtype=np.uint64) for p in postings]) if postings \
+            else np.empty(0, dtype=np.uint64)
+        self.doc_ids = (packed >> 16).astype(np.uint32)
+        self.term_frequencies = (packed & 0xFFFF).astype(np.uint16)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query: str, k: int = 10) -> List[tuple]:
+        """Return (doc_number, score) pairs for the k best BM25 matches"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.average_length or 1.0))
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_frequencies[start:end].astype(np.float32)
+            idf = math.log(1 + (len(self) - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Doc numbers are unique within a posting list, so fancy-index += is safe
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norms[docs])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(int(i), float(scores[i])) for i in matched]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """Fuse ranked lists of ids; each list contributes 1 / (k + rank)"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+def store_size(vector_store: VectorStore) -> int:
+    """Chunks in a FAISS store or a QuantizedVectorStore"""
+    if isinstance(vector_store, FAISS):
+        return len(vector_store.index_to_docstore_id)
+    return len(vector_store)
+
+
+def store_document(vector_store: VectorStore, position: int) -> Document:
+    """The chunk at a position: FAISS's docstore order, or a QuantizedVectorStore row"""
+    if isinstance(vector_store, FAISS):
+        return vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+    return vector_store.document(position)
+
+
+def dense_positions(vector_store: VectorStore, query_vectors: np.ndarray, k: int) -> List[List[int]]:
+    """Positions of the k nearest chunks for each row of query_vectors, searched in one call"""
+    if isinstance(vector_store, FAISS):
+        _, positions = vector_store.index.search(query_vectors, k)
+        return [[int(p) for p in row if p != -1] for row in positions]
+    return [[row for row, _ in hits] for hits in vector_store.search_batch(query_vectors, k)]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector retriever over the chunks of a FAISS or quantized store, fused with RRF
+
+    The BM25 half still finds exact identifiers (clause names, SKUs) that
+    embeddings blur together. Works anywhere a retriever does, including create_retrieval_chain and
+    create_history_aware_retriever. Rebuild it with from_vector_store after the
+    store changes, since BM25 doc numbers are store positions. Pass
+    normalize_L2=True when the store was built with it, so queries are
+    normalized the same way.
+    """
+
+    vector_store: VectorStore
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    normalize_L2: bool = False
+
+    @classmethod
+    def from_vector_store(cls, vector_store: VectorStore, **kwargs) -> "HybridRetriever":
+        texts = (store_document(vector_store, i).page_content for i in range(store_size(vector_store)))
+        return cls(vector_store=vector_store, bm25=BM25Index(texts), **kwargs)
+
+    def _document(self, position: int) -> Document:
+        return store_document(self.vector_store, position)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        query_vector = np.asarray([self.vector_store.embeddings.embed_query(query)], dtype=np.float32)
+        if self.normalize_L2:
+            query_vector /= np.linalg.norm(query_vector)
+        dense = dense_positions(self.vector_store, query_vector, self.fetch_k)[0]
+        sparse = [doc_number for doc_number, _ in self.bm25.search(query, self.fetch_k)]
+        return [self._document(p) for p in reciprocal_rank_fusion([dense, sparse], self.rrf_k)[:self.k]]
@@ -0,0 +1,201 @@
+"""Keep a FAISS index in sync with a folder, re-embedding only changed files
+
+Usage: python common/incremental_index.py <folder> --out <folder>/.index [--watch]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from common.index_store import file_sha256
+from common.loaders import LOADERS, load_files_parallel, load_source
+
+STATE_NAME = "files.json"
+
+
+def splitter_settings(splitter) -> dict:
+    """What decides a splitter's chunks: its class, sizes, separators and token encoding if it has them"""
+    settings = {"splitter": type(splitter).__name__}
+    for name in ("chunk_size", "chunk_overlap", "separators", "encoding"):
+        value = getattr(splitter, name, getattr(splitter, "_" + name, None))
+        if value is not None:
+            settings[name] = value
+    return settings
+
+
+class IncrementalIndexer:
+    """Tracks per-file content hashes and mtimes next to a saved FAISS index
+
+    sync() only loads, splits and embeds files that were added or changed, and
+    deletes the vectors of files that changed or disappeared. The state records
+    the splitter settings; an index split with other settings is rebuilt.
+    """
+
+    def __init__(self, index_path: str, embeddings: Embeddings, splitter,
+                 load_file: Callable[[str], List[Document]] = load_source,
+                 extensions=tuple(LOADERS), max_workers: int = 1, settings: Optional[dict] = None):
+        self.index_path = index_path
+        self.embeddings = embeddings
+        self.splitter = splitter
+        self.load_file = load_file
+        self.extensions = tuple(extensions)
+        self.max_workers = max_workers
+        # Round-tripped through JSON so tuples and lists compare equal to the saved copy
+        self.settings = json.loads(json.dumps(settings if settings is not None else splitter_settings(splitter)))
+        self.vector_store: Optional[FAISS] = None
+        self.files: Dict[str, dict] = {}
+        self._rebuild = False
+        self._lock = threading.Lock()
+        if os.path.exists(os.path.join(index_path, STATE_NAME)):
+            with open(os.path.join(index_path, STATE_NAME)) as f:
+                state = json.load(f)
+            if state.get("settings") != self.settings:
+                # Chunks from other settings can't be patched file by file; start over
+                print(f"{index_path} was split with different settings; rebuilding it")
+                self._rebuild = True
+                return
+            self.files = state["files"]
+            if os.path.exists(os.path.join(index_path, "index.faiss")):
+                self.vector_store = FAISS.load_local(index_path, embeddings,
+                                                     allow_dangerous_deserialization=True)
+
+    def _scan(self, folder: str) -> Dict[str, os.stat_result]:
+        found = {}
+        for root, dirs, names in os.walk(folder):
+            # Never index our own output if it lives inside the folder
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != os.path.abspath(self.index_path)]
+            for name in names:
+                if os.path.splitext(name)[1].lower() in self.extensions:
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, folder)] = os.stat(path)
+        return found
+
+    def changes(self, folder: str) -> dict:
+        """Classify files as added, changed or removed since the last sync"""
+        current = self._scan(folder)
+        added, changed, touched = [], [], []
+        for name, stat in sorted(current.items()):
+            known = self.files.get(name)
+            if known is None:
+                added.append(name)
+            elif (known["mtime"], known["size"]) != (stat.st_mtime, stat.st_size):
+                # Only hash when the cheap check says something moved
+                if file_sha256(os.path.join(folder, name)) != known["sha256"]:
+                    changed.append(name)
+                else:
+                    touched.append(name)
+        removed = sorted(set(self.files) - set(current))
+        return {"added": added, "changed": changed, "removed": removed, "touched": touched}
+
+    def sync(self, folder: str) -> dict:
+        """Apply folder changes to the index and save it; returns per-kind counts"""
+        with self._lock:
+            start = time.perf_counter()
+            diff = self.changes(folder)
+            stale_ids = [i for name in diff["changed"] + diff["removed"] for i in self.files[name]["ids"]]
+            if stale_ids and self.vector_store is not None:
+                self.vector_store.delete(stale_ids)
+            for name in diff["removed"]:
+                del self.files[name]
+
+            chunks_added, loads = 0, []
+            to_load = diff["added"] + diff["changed"]
+            paths = [os.path.join(folder, name) for name in to_load]
+            for name, path, (documents, entry) in zip(to_load, paths, self._load_grouped(paths)):
+                stat = os.stat(path)
+                loads.append(entry)
+                if entry["error"]:
+                    print(f"Error loading {name}: {entry['error']}")
+                    self.files.pop(name, None)
+                    continue
+                chunks = self.splitter.split_documents(documents)
+                ids = [f"{name}:{n}" for n in range(len(chunks))]
+                if chunks:
+                    if self.vector_store is None:
+                        self.vector_store = FAISS.from_documents(chunks, self.embeddings, ids=ids)
+                    else:
+                        self.vector_store.add_documents(chunks, ids=ids)
+                chunks_added += len(chunks)
+                self.files[name] = {"sha256": file_sha256(path), "mtime": stat.st_mtime,
+                                    "size": stat.st_size, "ids": ids}
+            for name in diff["touched"]:
+                stat = os.stat(os.path.join(folder, name))
+                self.files[name].update(mtime=stat.st_mtime, size=stat.st_size)
+
+            if self._rebuild or any(diff[kind] for kind in diff):
+                self._save()
+                self._rebuild = False
+            report = {kind: len(names) for kind, names in diff.items()}
+            report.update(chunks_added=chunks_added, chunks_deleted=len(stale_ids),
+                          seconds=time.perf_counter() - start, loads=loads)
+            return report
+
+    def _load_grouped(self, paths: List[str]):
+        """Load files on the worker pool, then regroup the flat result by file"""
+        documents, report = load_files_parallel(paths, self.load_file, self.max_workers)
+        grouped, start = [], 0
+        for entry in report:
+            grouped.append((documents[start:start + entry["documents"]], entry))
+            start += entry["documents"]
+        return grouped
+
+    def _save(self):
+        os.makedirs(self.index_path, exist_ok=True)
+        if self.vector_store is not None:
+            self.vector_store.save_local(self.index_path)
+        elif self._rebuild:
+            for name in ("index.faiss", "index.pkl"):
+                if os.path.exists(os.path.join(self.index_path, name)):
+                    os.remove(os.path.join(self.index_path, name))
+        with open(os.path.join(self.index_path, STATE_NAME), "w") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f, indent=2)
+
+    def watch(self, folder: str, interval: float = 2.0, on_sync: Optional[Callable[[dict], None]] = None,
+              stop: Optional[threading.Event] = None):
+        """Poll the folder and sync changes as they land until `stop` is set"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            report = self.sync(folder)
+            if on_sync and (report["added"] or report["changed"] or report["removed"]):
+                on_sync(report)
+            stop.wait(interval)
+
+
+def main():
+    from common.splitter import OffsetTextSplitter
+    from common.embedding_cache import CachedEmbeddings
+    from common.embedding_executor import EmbeddingExecutor
+    from common.fakes import DeterministicEmbeddings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--out", help="index folder (default: <folder>/.index)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--watch", action="store_true", help="keep applying changes as they land")
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="file loading processes")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    embeddings = DeterministicEmbeddings() if args.fake_embeddings else CachedEmbeddings(EmbeddingExecutor())
+    splitter = OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    indexer = IncrementalIndexer(args.out or os.path.join(args.folder, ".index"), embeddings, splitter,
+                                 max_workers=args.workers)
+    print(indexer.sync(args.folder))
+    if args.watch:
+        try:
+            indexer.watch(args.folder, args.interval, on_sync=print)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import datetime
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from common.loaders import LOADERS
+from common.quantized_store import QuantizedVectorStore
+from common.token_budget import counter_encoding, local_token_counter
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ManifestMismatchError(ValueError):
+    """A saved index was built with settings that differ from the caller's"""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def embedding_model_name(embeddings: Embeddings) -> str:
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def expand_sources(paths: List[str]) -> List[str]:
+    """Expand folders into the supported files they contain, in sorted order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names
+                             if os.path.splitext(name)[1].lower() in LOADERS)
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def index_settings(embeddings: Embeddings, chunk_size: int, chunk_overlap: int, chunk_unit: str = "chars") -> dict:
+    """How an index's chunks and vectors were made, as recorded in its manifest
+
+    Token-sized chunks also record the tokenizer that sized them, since the
+    ~4 characters/token fallback cuts different chunks than tiktoken.
+    """
+    settings = {
+        "embedding_model": embedding_model_name(embeddings),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_unit": chunk_unit,
+    }
+    if chunk_unit == "tokens":
+        settings["token_encoding"] = counter_encoding(local_token_counter())
+    return settings
+
+
+def source_hashes(index_path: str, sources: List[str]) -> Dict[str, str]:
+    # Keys are relative to the index folder so the manifest is valid from any cwd
+    return {os.path.relpath(os.path.abspath(source), os.path.abspath(index_path)).replace(os.sep, "/"):
+            file_sha256(source) for source in sources}
+
+
+def save_index(vector_store: VectorStore, index_path: str, sources: List[str], embeddings: Embeddings,
+               chunk_size: int, chunk_overlap: int, chunk_unit: str = "chars") -> dict:
+    """Save the FAISS index and docstore next to a manifest describing how it was built
+
+    A QuantizedVectorStore already lives in its files at index_path, so only
+    the manifest is written for it.
+    """
+    if isinstance(vector_store, QuantizedVectorStore):
+        store, chunks = vector_store.meta["dtype"], len(vector_store)
+    else:
+        vector_store.save_local(index_path)
+        store, chunks = "faiss", vector_store.index.ntotal
+    manifest = {
+        **index_settings(embeddings, chunk_size, chunk_overlap, chunk_unit),
+        "store": store,
+        "chunks": chunks,
+        "sources": source_hashes(index_path, sources),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    with open(os.path.join(index_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(index_path: str) -> dict:
+    with open(os.path.join(index_path, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def load_index(index_path: str, embeddings: Embeddings, chunk_size: int, chunk_overlap: int,
+               sources: Optional[List[str]] = None, chunk_unit: str = "chars") -> VectorStore:
+    """Load a prebuilt index, refusing one whose manifest doesn't match the caller
+
+    When `sources` are given their hashes must also match, so a stale index is
+    rejected rather than silently served. Indexes built with --store int8 or
+    float16 load as a QuantizedVectorStore, others as FAISS.
+    """
+    manifest = read_manifest(index_path)
+    expected = index_settings(embeddings, chunk_size, chunk_overlap, chunk_unit)
+    # Manifests written before chunk_unit existed were all sized in characters
+    manifest.setdefault("chunk_unit", "chars")
+    for key, value in expected.items():
+        if manifest.get(key) != value:
+            raise ManifestMismatchError(
+                f"Index at {index_path} was built with {key}={manifest.get(key)!r}, expected {value!r}"
+            )
+    if sources is not None and source_hashes(index_path, sources) != manifest["sources"]:
+        raise ManifestMismatchError(f"Index at {index_path} is stale; rebuild it from the current sources")
+    if manifest.get("store", "faiss") != "faiss":
+        return QuantizedVectorStore.load(index_path, embeddings)
+    # The pickled docstore was written by build_index, not received from a user
+    return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
@@ -0,0 +1,174 @@
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "llm_responses.sqlite"),
+)
+
+
+class ResponseCache(BaseCache):
+    """Exact-match LLM response cache persisted in SQLite
+
+    langchain calls it with the fully rendered prompt messages and an
+    llm_string that encodes the model and its parameters, so any
+    `prompt | llm` pipeline is cached by passing `cache=` to the model.
+    A small in-memory LRU sits in front of the disk for repeat hits, and
+    the disk keeps at most `max_entries`, evicting least recently used.
+    Eviction and the last-used times of hits are written in batches, every
+    `evict_every` inserts or touched keys, so the disk can briefly hold up to
+    that many extra entries.
+
+    Set LLM_CACHE_BYPASS=1, pass enabled=False, or wrap calls in
+    `with cache.bypass():` for non-deterministic runs.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 50_000,
+                 memory_entries: int = 1024, enabled: Optional[bool] = None, evict_every: int = 100):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.evict_every = evict_every
+        self.enabled = not os.getenv("LLM_CACHE_BYPASS") if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        # Hits not yet written to last_used on disk, and inserts since the last eviction
+        self._touched = {}
+        self._inserts = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _active(self) -> bool:
+        return self.enabled and not getattr(self._local, "bypass", False)
+
+    @contextlib.contextmanager
+    def bypass(self, active: bool = True):
+        """Skip the cache for calls made in this thread inside the block; blocks nest"""
+        previous = getattr(self._local, "bypass", False)
+        self._local.bypass = active
+        try:
+            yield
+        finally:
+            self._local.bypass = previous
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if not self._active():
+            return None
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                generations = self._memory[key]
+            else:
+                row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                generations = _loads(row[0])
+                self._remember(key, generations)
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.evict_every:
+                self._write_touched()
+                self._conn.commit()
+            return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not self._active():
+            return
+        key = self._key(prompt, llm_string)
+        value = _dumps(return_val)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, last_used) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._touched.pop(key, None)
+            self._inserts += 1
+            if self._inserts >= self.evict_every:
+                self._evict()
+            self._conn.commit()
+            self._remember(key, return_val)
+
+    def _write_touched(self):
+        self._conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                               [(used, key) for key, used in self._touched.items()])
+        self._touched.clear()
+
+    def _evict(self):
+        # Hits count as uses, so they are written before picking the least recently used
+        self._write_touched()
+        self._inserts = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def _remember(self, key: str, generations: Any):
+        self._memory[key] = generations
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+def _dumps(generations: RETURN_VAL_TYPE) -> str:
+    items = []
+    for generation in generations:
+        item = {"text": generation.text, "generation_info": generation.generation_info}
+        if isinstance(generation, ChatGeneration):
+            item["message"] = message_to_dict(generation.message)
+        items.append(item)
+    return json.dumps(items)
+
+
+def _loads(value: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for item in json.loads(value):
+        if "message" in item:
+            generations.append(ChatGeneration(message=messages_from_dict([item["message"]])[0],
+                                              generation_info=item["generation_info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+    return generations
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache(path: str = DEFAULT_CACHE_PATH) -> ResponseCache:
+    """One cache per path per process, so Streamlit reruns reuse the hot LRU"""
+    return ResponseCache(path)
@@ -0,0 +1,122 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
+from langchain_core.documents import Document
+
+from common.streaming_ingest import iter_pdf_pages
+
+LOADERS = {".txt": TextLoader, ".pdf": PyPDFLoader, ".docx": Docx2txtLoader}
+
+
+def load_source(path: str) -> List[Document]:
+    """Load one file with the loader the scripts use for its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in LOADERS:
+        raise ValueError(f"Unsupported file type: {path}")
+    return LOADERS[extension](path).load()
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only stream over a bytes-like object, without copying it
+
+    io.BytesIO(memoryview) would copy the whole upload; this slices the
+    memoryview instead, so parsers read straight from Streamlit's buffer.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def iter_upload(data, name: str) -> Iterator[Document]:
+    """Parse an in-memory upload (PDF page by page, DOCX or TXT) without a temp file
+
+    `data` is anything exposing the buffer protocol, e.g. uploaded_file.getbuffer().
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension == ".pdf":
+        yield from iter_pdf_pages(BufferReader(data), name)
+        return
+    if extension == ".docx":
+        import docx2txt
+
+        text = docx2txt.process(BufferReader(data))
+    elif extension == ".txt":
+        text = str(memoryview(data), "utf-8")
+    else:
+        raise ValueError(f"Unsupported upload type: {name}")
+    yield Document(page_content=text, metadata={"source": name, "page": 0, "total_pages": 1})
+
+
+def load_upload(data, name: str) -> List[Document]:
+    return list(iter_upload(data, name))
+
+
+def load_with_unstructured(path: str) -> List[Document]:
+    """Partition a file through the hosted Unstructured API, chunked by title"""
+    from langchain_unstructured import UnstructuredLoader
+
+    loader = UnstructuredLoader(path,
+                api_key=os.getenv("UNSTRUCTURED_API_KEY"),
+                partition_via_api=True,
+                chunking_strategy="by_title",
+                strategy="fast")
+    return loader.load()
+
+
+def _timed_load(load_file: Callable[[str], List[Document]], path: str):
+    start = time.perf_counter()
+    try:
+        documents, error = load_file(path), None
+    except Exception as e:
+        documents, error = [], f"{type(e).__name__}: {e}"
+    return documents, time.perf_counter() - start, error
+
+
+def load_files_parallel(paths: List[str], load_file: Callable[[str], List[Document]] = load_source,
+                        max_workers: Optional[int] = None,
+                        use_processes: bool = True) -> Tuple[List[Document], List[dict]]:
+    """Load files on a worker pool, keeping documents in the order of `paths`
+
+    Returns (documents, report) where report has one entry per file with its
+    load time and error, if any; a failing file never aborts the batch.
+    load_file must be a module-level function when use_processes is True.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(paths) <= 1:
+        results = [_timed_load(load_file, path) for path in paths]
+    else:
+        pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool(max_workers=min(max_workers, len(paths))) as executor:
+            results = list(executor.map(partial(_timed_load, load_file), paths))
+
+    documents, report = [], []
+    for path, (loaded, seconds, error) in zip(paths, results):
+        documents.extend(loaded)
+        report.append({"path": path, "documents": len(loaded), "seconds": seconds, "error": error})
+    return documents, report
@@ -0,0 +1,135 @@
+"""Local fast-path partitioning, with the Unstructured API kept for layout-heavy files
+
+Plain text, .docx and text-layer PDFs are read locally and turned into
+Title/NarrativeText/ListItem elements by cheap line heuristics, then grouped by
+unstructured's own chunk_by_title so chunks keep the API's by_title semantics.
+Scanned PDFs, legacy .doc and .rtf still go to load_with_unstructured.
+"""
+import os
+import re
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from common.loaders import load_with_unstructured
+
+# Below this many extracted characters per page a PDF is treated as scanned
+MIN_CHARS_PER_PAGE = 200
+MAX_CHARACTERS = 500
+TITLE_MAX_WORDS = 12
+
+_BULLET = re.compile(r"^\s*(?:[-*•▪●]|\d{1,3}[.)])\s+")
+_ENDS_IN_PUNCTUATION = re.compile(r"[.,;:!?]\s*$")
+
+
+def sniff_format(path: str) -> str:
+    """Detect the real format from the file's leading bytes, falling back to its extension"""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "doc"
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension or "txt"
+
+
+def _local_pages(path: str, kind: str) -> Optional[List[Tuple[int, str]]]:
+    """(page number, text) pairs read locally, or None when the file needs layout analysis"""
+    if kind == "txt":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return [(1, f.read())]
+    if kind == "docx":
+        import docx2txt
+
+        return [(1, docx2txt.process(path))]
+    if kind == "pdf":
+        from pypdf import PdfReader
+
+        pages = [(number, page.extract_text() or "") for number, page in enumerate(PdfReader(path).pages, 1)]
+        characters = sum(len(text.strip()) for _, text in pages)
+        if not pages or characters < MIN_CHARS_PER_PAGE * len(pages):
+            return None
+        return pages
+    return None
+
+
+def _is_title(line: str) -> bool:
+    words = line.split()
+    if not words or len(words) > TITLE_MAX_WORDS or line.isnumeric():
+        return False
+    if _ENDS_IN_PUNCTUATION.search(line):
+        return False
+    return sum(c.isalpha() for c in line) >= 0.5 * len(line.replace(" ", ""))
+
+
+def text_elements(pages: Iterable[Tuple[int, str]], path: str) -> list:
+    """Classify each non-empty line as an unstructured Title, ListItem or NarrativeText element"""
+    from unstructured.documents.elements import ElementMetadata, ListItem, NarrativeText, Title
+
+    filetype = sniff_format(path)
+    elements = []
+    for page_number, text in pages:
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if _BULLET.match(line):
+                element = ListItem(text=_BULLET.sub("", line))
+            elif _is_title(line):
+                element = Title(text=line)
+            else:
+                element = NarrativeText(text=line)
+            element.metadata = ElementMetadata(filename=path, page_number=page_number, filetype=filetype)
+            elements.append(element)
+    return elements
+
+
+def partition_local(path: str, kind: Optional[str] = None,
+                    max_characters: int = MAX_CHARACTERS) -> Optional[List[Document]]:
+    """By-title chunks for a file read locally, or None if it has to go to the API"""
+    from unstructured.chunking.title import chunk_by_title
+
+    pages = _local_pages(path, kind or sniff_format(path))
+    if pages is None:
+        return None
+    documents = []
+    for chunk in chunk_by_title(text_elements(pages, path), max_characters=max_characters):
+        metadata = {key: value for key, value in chunk.metadata.to_dict().items() if key != "orig_elements"}
+        metadata.update(source=path, category=chunk.category, partitioner="local")
+        documents.append(Document(page_content=chunk.text, metadata=metadata))
+    return documents
+
+
+def partition_file(path: str) -> List[Document]:
+    """Partition one file locally when possible, otherwise through the Unstructured API"""
+    documents = partition_local(path)
+    if documents is not None:
+        return documents
+    documents = load_with_unstructured(path)
+    for document in documents:
+        document.metadata["partitioner"] = "api"
+    return documents
+
+
+def throughput_by_format(report: List[dict]) -> dict:
+    """Files, MB and MB/s per sniffed format from a load_files_parallel report"""
+    totals = defaultdict(lambda: {"files": 0, "megabytes": 0.0, "seconds": 0.0, "errors": 0})
+    for entry in report:
+        try:
+            kind, size = sniff_format(entry["path"]), os.path.getsize(entry["path"]) / 2**20
+        except OSError:
+            continue
+        total = totals[kind]
+        total["files"] += 1
+        total["megabytes"] += size
+        total["seconds"] += entry["seconds"]
+        total["errors"] += bool(entry["error"])
+    for total in totals.values():
+        total["mb_per_second"] = total["megabytes"] / total["seconds"] if total["seconds"] else 0.0
+    return dict(totals)
@@ -0,0 +1,222 @@
+import json
+import mmap
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (codes, per-row scales) for float16 or symmetric int8 storage"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _append_rows(path: str, vectors: np.ndarray, texts: List[str], metadatas: List[dict], dtype: str,
+                 docs_size: int):
+    """Append normalized vectors, their codes and their documents to the files of a store at `path`"""
+    codes, scales = quantize(vectors, dtype)
+    for name, array in (("codes.bin", codes), ("scales.f32", scales), ("vectors.f32", vectors)):
+        with open(os.path.join(path, name), "ab") as f:
+            array.tofile(f)
+    offsets = []
+    with open(os.path.join(path, "docs.jsonl"), "ab") as f:
+        for text, metadata in zip(texts, metadatas):
+            line = json.dumps({"page_content": text, "metadata": metadata}).encode("utf-8") + b"\n"
+            f.write(line)
+            docs_size += len(line)
+            offsets.append(docs_size)
+    with open(os.path.join(path, "offsets.i64"), "ab") as f:
+        np.asarray(offsets, dtype=np.int64).tofile(f)
+
+
+class QuantizedVectorStore(VectorStore):
+    """Vector store backed by memory-mapped, quantized vectors
+
+    Candidates are scored on the float16/int8 codes, one block of rows at a
+    time, and the best `rescore` of them are re-ranked against the float32
+    copy, so only a handful of full-precision rows are ever paged in. Every
+    file is mapped read-only, which lets several processes share one
+    page-cached copy; add_texts appends to the files and remaps them.
+
+    Files in `path`: meta.json, codes.bin, scales.f32, vectors.f32,
+    docs.jsonl and offsets.i64.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, rescore: int = 50,
+                 block_size: int = 65536):
+        self.path = path
+        self.embedding = embedding
+        self.rescore = rescore
+        self.block_size = block_size
+        self._open()
+
+    def _open(self):
+        path = self.path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.codes = np.memmap(os.path.join(path, "codes.bin"), mode="r",
+                               dtype=DTYPES[self.meta["dtype"]], shape=(count, dim))
+        self.scales = np.memmap(os.path.join(path, "scales.f32"), mode="r",
+                                dtype=np.float32, shape=(count,))
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), mode="r",
+                                 dtype=np.float32, shape=(count, dim))
+        self.offsets = np.memmap(os.path.join(path, "offsets.i64"), mode="r",
+                                 dtype=np.int64, shape=(count + 1,))
+        with open(os.path.join(path, "docs.jsonl"), "rb") as f:
+            self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    @staticmethod
+    def write(path: str, vectors, texts: List[str], metadatas: Optional[List[dict]] = None,
+              dtype: str = "int8", model: Optional[str] = None):
+        """Write normalized vectors and their documents to `path`"""
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(DTYPES)}, got {dtype!r}")
+        vectors = _normalize(vectors)
+        os.makedirs(path, exist_ok=True)
+        for name in ("codes.bin", "scales.f32", "vectors.f32", "docs.jsonl"):
+            open(os.path.join(path, name), "wb").close()
+        np.zeros(1, dtype=np.int64).tofile(os.path.join(path, "offsets.i64"))
+        _append_rows(path, vectors, texts, metadatas or [{} for _ in texts], dtype, 0)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dtype": dtype, "count": len(texts), "dim": int(vectors.shape[1]),
+                       "model": model}, f, indent=2)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   *, path: str, dtype: str = "int8", **kwargs: Any) -> "QuantizedVectorStore":
+        texts = list(texts)
+        cls.write(path, embedding.embed_documents(texts), texts, metadatas, dtype,
+                  getattr(embedding, "model", None))
+        return cls(path, embedding, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, **kwargs: Any) -> "QuantizedVectorStore":
+        return cls(path, embedding, **kwargs)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        """Embed and append texts, returning their row numbers as ids
+
+        Other processes see the new rows once they load the store again.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = _normalize(self.embedding.embed_documents(texts))
+        if vectors.shape[1] != self.meta["dim"]:
+            raise ValueError(f"Vectors have {vectors.shape[1]} dimensions, the store has {self.meta['dim']}")
+        start = len(self)
+        _append_rows(self.path, vectors, texts, list(metadatas or [{} for _ in texts]), self.meta["dtype"],
+                     int(self.offsets[-1]))
+        self.meta["count"] = start + len(texts)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+        self._open()
+        return [str(row) for row in range(start, len(self))]
+
+    def document(self, index: int) -> Document:
+        line = self._docs[int(self.offsets[index]):int(self.offsets[index + 1])]
+        return Document(**json.loads(line))
+
+    def _candidates(self, queries: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, code scores) of the `count` best rows for each unit query, one block of codes at a time"""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            scores = (queries @ self.codes[start:stop].astype(np.float32).T) * self.scales[start:stop]
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), scores.shape)], axis=1)
+            if best_scores.shape[1] > count:
+                keep = np.argpartition(-best_scores, count - 1, axis=1)[:, :count]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_rows, best_scores
+
+    def search_batch(self, query_vectors, k: int = 4, rescore: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """(row, cosine) pairs of the k nearest rows for each query, sharing one pass over the codes"""
+        queries = _normalize(np.atleast_2d(query_vectors))
+        candidates = min(max(k, self.rescore if rescore is None else rescore), len(self))
+        if candidates == 0:
+            return [[] for _ in queries]
+        results = []
+        for query, rows in zip(queries, self._candidates(queries, candidates)[0]):
+            # Re-rank the surviving candidates at full precision
+            rows = np.sort(rows)
+            exact = self.vectors[rows] @ query
+            order = np.argsort(-exact)[:k]
+            results.append([(int(rows[i]), float(exact[i])) for i in order])
+        return results
+
+    def search(self, query_vector, k: int = 4, rescore: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (row, cosine) pairs for the k nearest rows"""
+        return self.search_batch([query_vector], k, rescore)[0]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return [(self.document(row), score) for row, score in self.search(embedding, k, kwargs.get("rescore"))]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+
+def compare_with_faiss(store: QuantizedVectorStore, faiss_store, query_vectors, k: int = 4,
+                       rescore_levels=(0, 10, 50)) -> List[dict]:
+    """Recall@k of the quantized store against the FAISS flat index
+
+    rescore=0 means candidates are ranked on the quantized codes alone.
+    """
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    _, reference = faiss_store.index.search(query_vectors, k)
+    # FAISS ids are positions in the docstore; map them back to store rows
+    reference = [set(row) for row in reference]
+    report = []
+    for rescore in rescore_levels:
+        found = 0
+        for query, expected in zip(query_vectors, reference):
+            if rescore:
+                rows = [row for row, _ in store.search(query, k, rescore=rescore)]
+            else:
+                rows = _quantized_only(store, query, k)
+            found += len(expected.intersection(rows))
+        report.append({"rescore": rescore, "recall_at_k": found / (k * len(query_vectors))})
+    return report
+
+
+def _quantized_only(store: QuantizedVectorStore, query, k: int) -> List[int]:
+    rows, scores = store._candidates(_normalize([query]), min(k, len(store)))
+    return list(rows[0][np.argsort(-scores[0])])
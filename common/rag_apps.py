@@ -0,0 +1,141 @@
+"""The RAG apps' prompts, retrieval settings and chains, shared by the Streamlit scripts, the service and batch_qa
+
+Each app is one RagAppConfig. The scripts run it through app_retriever,
+answer_chain and app_chain. The service skips the chain runnables on its hot
+path but renders the same prompts (CONTEXTUALIZE_PROMPT, app_prompt,
+stuffed_messages) over the same retrieval settings and context budget.
+"""
+import os
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import List, Optional, Sequence
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_community.document_loaders import Docx2txtLoader, TextLoader
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import LanguageModelLike
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
+from langchain_core.vectorstores import VectorStore
+
+from common.hybrid_retriever import HybridRetriever
+from common.index_store import ManifestMismatchError, load_index
+from common.semantic_cache import standalone_question
+from common.token_budget import TokenBudgetSplitter, budgeted_retriever
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+QA_SYSTEM_PROMPT = """You are an assistant for answering questions.
+Use the provided context to respond. If the answer
+isn't clear, acknowledge that you don't know.
+Limit your response to three concise sentences.
+{context}"""
+
+RESUME_SYSTEM_PROMPT = """You are an assistant for answering any questions
+with well-thought and fact-checked responses.
+If the answer isn't clear, acknowledge that you don't know.
+{context}"""
+
+# Same job as create_history_aware_retriever's rephrase step
+CONTEXTUALIZE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Given the chat history and the latest question, rewrite the question so it can be "
+         "understood without the history. Do not answer it; return only the rewritten question."),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+
+@dataclass
+class RagAppConfig:
+    """One app: its source document, prebuilt index, chunking, retrieval settings and prompt"""
+
+    name: str
+    source: str
+    system_prompt: str
+    index_path: Optional[str] = None
+    chunk_tokens: int = 250
+    overlap_tokens: int = 50
+    k: int = 8
+    fetch_k: int = 20
+    max_context_tokens: int = 1000
+    hybrid: bool = True
+    normalize_L2: bool = False
+
+
+# Paths are relative to the repository root
+APPS = {
+    "legal": RagAppConfig("legal", "rag/Legal_Document_Analysis_Data.txt", QA_SYSTEM_PROMPT, "rag/indexes/legal"),
+    "product": RagAppConfig("product", "rag/product-data.txt", QA_SYSTEM_PROMPT, "rag/indexes/product"),
+    "resume": RagAppConfig("resume", "use_case/NIW_Resume.docx", RESUME_SYSTEM_PROMPT, overlap_tokens=25,
+                           hybrid=False),
+}
+
+
+def app_prompt(config: RagAppConfig) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [("system", config.system_prompt), MessagesPlaceholder(variable_name="chat_history", optional=True),
+         ("human", "{input}")]
+    )
+
+
+def stuffed_messages(prompt: ChatPromptTemplate, documents: List[Document], question: str,
+                     history: Sequence[BaseMessage] = ()) -> List[BaseMessage]:
+    """The answer prompt with documents stuffed into {context}, as create_stuff_documents_chain renders it"""
+    context = "\n\n".join(document.page_content for document in documents)
+    return prompt.format_messages(context=context, chat_history=list(history), input=question)
+
+
+def app_retriever(config: RagAppConfig, vector_store: VectorStore) -> BaseRetriever:
+    """The app's top-k retriever over a vector store: BM25 + vector fusion when hybrid, else vector only"""
+    if config.hybrid:
+        return HybridRetriever.from_vector_store(vector_store, k=config.k, fetch_k=config.fetch_k,
+                                                 normalize_L2=config.normalize_L2)
+    return vector_store.as_retriever(search_kwargs={"k": config.k})
+
+
+def rephrase_question(llm: LanguageModelLike) -> Runnable:
+    """The standalone form of a follow-up question, to retrieve with and to key caches by"""
+    return standalone_question(llm, CONTEXTUALIZE_PROMPT)
+
+
+def _pick(key: str) -> Runnable:
+    async def apick(inputs: dict):
+        return inputs[key]
+
+    # With afunc, ainvoke reads the key in place instead of on an executor thread
+    return RunnableLambda(itemgetter(key), afunc=apick)
+
+
+def answer_chain(config: RagAppConfig, llm: LanguageModelLike, retriever: BaseRetriever) -> Runnable:
+    """Retrieve for inputs["query"], pack the results into the context budget and answer inputs["input"]
+
+    The output is create_retrieval_chain's: the inputs plus "context" and "answer".
+    """
+    retrieval = budgeted_retriever(_pick("query") | retriever, max_tokens=config.max_context_tokens)
+    return create_retrieval_chain(retrieval, create_stuff_documents_chain(llm, app_prompt(config)))
+
+
+def app_chain(config: RagAppConfig, llm: LanguageModelLike, retriever: BaseRetriever) -> Runnable:
+    """answer_chain behind the rephrase step, taking {"input", "chat_history"} like create_retrieval_chain"""
+    return RunnablePassthrough.assign(query=rephrase_question(llm)) | answer_chain(config, llm, retriever)
+
+
+def load_app_index(config: RagAppConfig, embeddings: Embeddings) -> VectorStore:
+    """The app's prebuilt index (FAISS or quantized) when there is one, else a fresh FAISS build from its source"""
+    source = os.path.join(ROOT, config.source)
+    if config.index_path and os.path.exists(os.path.join(ROOT, config.index_path)):
+        try:
+            return load_index(os.path.join(ROOT, config.index_path), embeddings, chunk_size=config.chunk_tokens,
+                              chunk_overlap=config.overlap_tokens, sources=[source], chunk_unit="tokens")
+        except ManifestMismatchError as e:
+            print(f"{e}; building {config.name} in memory instead (rerun build_index.py to refresh it)")
+    loader = Docx2txtLoader(source) if source.endswith(".docx") else TextLoader(source)
+    splitter = TokenBudgetSplitter(chunk_tokens=config.chunk_tokens, overlap_tokens=config.overlap_tokens)
+    return FAISS.from_documents(splitter.split_documents(loader.load()), embeddings)
@@ -0,0 +1,409 @@
+"""Headless async RAG service: preloaded indexes, micro-batched embeddings and searches, streamed answers
+
+Usage: python common/rag_service.py --port 8080 [--app legal --app product]
+
+POST /apps/<name>/ask     {"question": ..., "session_id": optional} -> {"answer", "sources", "timings"}
+POST /apps/<name>/stream  same body -> text/event-stream: {"token": ...} events, then {"sources", "timings"}
+GET  /stats               batching, concurrency and latency counters
+
+Every app's index is loaded once at startup and shared by all requests.
+Prompts, retrieval settings and the context budget come from rag_apps, as in
+the Streamlit scripts, but requests call the batchers and model directly
+rather than going through chain runnables, whose per-step overhead would
+cost more than batching saves. Queries that arrive within a few milliseconds
+of each other are embedded in one API call and searched in one index call,
+and each upstream model has its own cap on in-flight requests so bursts
+queue here instead of hitting 429s.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+from aiohttp import web
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.vectorstores import VectorStore
+from common.chat_history import SessionHistoryStore
+from common.history_window import HistoryCompactor
+from common.hybrid_retriever import BM25Index, dense_positions, reciprocal_rank_fusion, store_document, store_size
+from common.rag_apps import (APPS, CONTEXTUALIZE_PROMPT, ROOT, RagAppConfig, app_prompt, load_app_index,
+                             stuffed_messages)
+from common.token_budget import pack_documents
+
+class MicroBatcher:
+    """Coalesce concurrent submit() calls into one call of an async batch function
+
+    A batch is sent when `max_batch` items are waiting or `max_wait` seconds
+    after its first item, whichever comes first. Results come back per item,
+    in order; a failed or cancelled batch, or one with the wrong number of
+    results, fails every item in it.
+    """
+
+    def __init__(self, batch_function: Callable[[List[Any]], Awaitable[List[Any]]], max_batch: int = 64,
+                 max_wait: float = 0.005, name: str = "batch"):
+        self.batch_function = batch_function
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._waiting = []
+        self._timer = None
+        self._deadline = 0.0
+        self._running = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((item, future))
+        # A busy loop runs the timer late; a batch that is already due goes without waiting for it
+        if len(self._waiting) >= self.max_batch or (self._timer is not None and loop.time() >= self._deadline):
+            self._flush()
+        elif self._timer is None:
+            self._deadline = loop.time() + self.max_wait
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        waiting, self._waiting = self._waiting, []
+        if waiting:
+            # The loop only keeps weak references to tasks
+            task = asyncio.ensure_future(self._run(waiting))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, waiting: list):
+        self.batches += 1
+        self.items += len(waiting)
+        try:
+            results = await self.batch_function([item for item, _ in waiting])
+            if len(results) != len(waiting):
+                raise RuntimeError(f"{self.name}: {len(results)} results for {len(waiting)} items")
+        except asyncio.CancelledError:
+            _fail(waiting, RuntimeError(f"{self.name}: batch cancelled"))
+            raise
+        except Exception as e:
+            _fail(waiting, e)
+            return
+        for (_, future), result in zip(waiting, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0}
+
+
+def _fail(waiting: list, error: BaseException):
+    for _, future in waiting:
+        if not future.done():
+            future.set_exception(error)
+
+
+class ModelLimits:
+    """One semaphore per upstream model, capping its in-flight requests across all apps"""
+
+    def __init__(self, default: int = 8, limits: Optional[Dict[str, int]] = None):
+        self.default = default
+        self.limits = dict(limits or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.peak: Dict[str, int] = defaultdict(int)
+
+    def limit(self, model: str) -> "_Slot":
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._semaphores[model] = asyncio.Semaphore(self.limits.get(model, self.default))
+        return _Slot(self, model, semaphore)
+
+    def wrap(self, model: BaseChatModel) -> "LimitedModel":
+        return LimitedModel(model, self)
+
+    def stats(self) -> dict:
+        return {model: {"limit": self.limits.get(model, self.default), "in_flight": self.in_flight[model],
+                        "peak": self.peak[model]} for model in self._semaphores}
+
+
+class _Slot:
+    def __init__(self, limits: ModelLimits, model: str, semaphore: asyncio.Semaphore):
+        self.limits, self.model, self.semaphore = limits, model, semaphore
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        self.limits.in_flight[self.model] += 1
+        self.limits.peak[self.model] = max(self.limits.peak[self.model], self.limits.in_flight[self.model])
+
+    async def __aexit__(self, *exc):
+        self.limits.in_flight[self.model] -= 1
+        self.semaphore.release()
+
+
+def _model_name(model: Any) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+
+
+class LimitedModel(Runnable[LanguageModelInput, BaseMessage]):
+    """A chat model whose async calls first wait for a slot in ModelLimits, usable inside chains
+
+    Sync calls go straight to the model; only the event loop's callers are capped.
+    """
+
+    def __init__(self, model: BaseChatModel, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.model_name = _model_name(model)
+
+    def invoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs) -> BaseMessage:
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> BaseMessage:
+        async with self.limits.limit(self.model_name):
+            return await self.model.ainvoke(input, config, **kwargs)
+
+    async def astream(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> AsyncIterator[BaseMessage]:
+        async with self.limits.limit(self.model_name):
+            async for chunk in self.model.astream(input, config, **kwargs):
+                yield chunk
+
+
+def source_reference(document: Document) -> dict:
+    """Where a chunk came from: its source path relative to the repository root and its character offsets"""
+    reference = {"source": os.path.relpath(document.metadata.get("source", ""), ROOT).replace(os.sep, "/")}
+    for key in ("start_index", "end_index"):
+        if key in document.metadata:
+            reference[key] = document.metadata[key]
+    return reference
+
+
+class ServedApp:
+    """A preloaded index answering with its app's prompts and settings through the service's batchers and limits"""
+
+    def __init__(self, config: RagAppConfig, vector_store: VectorStore, service: "RagService"):
+        self.config = config
+        self.vector_store = vector_store
+        self.service = service
+        self.prompt = app_prompt(config)
+        self.documents = [store_document(vector_store, i) for i in range(store_size(vector_store))]
+        self.bm25 = BM25Index(document.page_content for document in self.documents) if config.hybrid else None
+        self.searches = MicroBatcher(self._search_batch, name=f"{config.name}.search")
+
+    def _rank(self, matrix: np.ndarray, queries: List[str]) -> List[List[int]]:
+        """Document positions per query, as app_retriever ranks them: vector search, fused with BM25 when hybrid"""
+        if self.config.normalize_L2:
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        rankings = dense_positions(self.vector_store, matrix, self.config.fetch_k)
+        if self.bm25 is not None:
+            rankings = [reciprocal_rank_fusion([dense, [n for n, _ in self.bm25.search(query, self.config.fetch_k)]])
+                        for dense, query in zip(rankings, queries)]
+        return [ranking[:self.config.k] for ranking in rankings]
+
+    async def _search_batch(self, items: List[tuple]) -> List[List[int]]:
+        matrix = np.vstack([vector for vector, _ in items]).astype(np.float32)
+        # One thread hop per batch: FAISS and numpy release the GIL, and BM25 scoring stays off the event loop
+        return await asyncio.to_thread(self._rank, matrix, [query for _, query in items])
+
+    async def retrieve(self, query: str, timings: dict) -> List[Document]:
+        """The top k chunks for a query, packed into the app's context budget"""
+        start = time.perf_counter()
+        vector = await self.service.query_embeddings.submit(query)
+        timings["embed_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        ranking = await self.searches.submit((np.asarray(vector, dtype=np.float32), query))
+        timings["search_seconds"] = time.perf_counter() - start
+        return pack_documents([self.documents[p] for p in ranking], self.config.max_context_tokens)
+
+    async def answer(self, question: str, session_id: Optional[str], timings: dict, stream: bool = True):
+        """Yield answer tokens (or the whole answer at once without `stream`), then a dict with the sources"""
+        start = time.perf_counter()
+        model = self.service.model
+        history: List[BaseMessage] = await self.service.history.acompact(session_id) if session_id else []
+        query = question
+        if history:
+            rephrased = await model.ainvoke(CONTEXTUALIZE_PROMPT.format_messages(chat_history=history,
+                                                                                 input=question))
+            query = rephrased.content
+        documents = await self.retrieve(query, timings)
+        messages = stuffed_messages(self.prompt, documents, question, history)
+        pieces = []
+        if stream:
+            async for chunk in model.astream(messages):
+                if chunk.content:
+                    if "first_token_seconds" not in timings:
+                        timings["first_token_seconds"] = time.perf_counter() - start
+                    pieces.append(chunk.content)
+                    yield chunk.content
+        else:
+            # Parsing a stream costs a pydantic model per token; a single response is cheaper
+            pieces.append((await model.ainvoke(messages)).content)
+            yield pieces[0]
+        answer = "".join(pieces)
+        if session_id:
+            await asyncio.to_thread(self.service.history_store.append, session_id,
+                                    [HumanMessage(question), AIMessage(answer)])
+        timings["seconds"] = time.perf_counter() - start
+        self.service.latencies.append(timings["seconds"])
+        yield {"sources": [source_reference(document) for document in documents], "timings": timings}
+
+
+class RagService:
+    """The hosted apps plus what they share: embedding batcher, model limits, LLM and chat history"""
+
+    def __init__(self, embeddings: Embeddings, llm: BaseChatModel, limits: Optional[ModelLimits] = None,
+                 history_store: Optional[SessionHistoryStore] = None, max_batch: int = 64,
+                 max_wait: float = 0.005):
+        self.embeddings = embeddings
+        self.llm = llm
+        self.limits = limits or ModelLimits()
+        # Answers, rephrasing and history summaries all share the model's concurrency cap
+        self.model = self.limits.wrap(llm)
+        self.history_store = history_store or SessionHistoryStore(":memory:")
+        self.history = HistoryCompactor(self.model, self.history_store)
+        self.query_embeddings = MicroBatcher(self._embed_batch, max_batch, max_wait, name="query_embeddings")
+        self.apps: Dict[str, ServedApp] = {}
+        self.requests = 0
+        self.latencies = deque(maxlen=10000)
+
+    async def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        async with self.limits.limit(_model_name(self.embeddings)):
+            return await self.embeddings.aembed_documents(queries)
+
+    def add_app(self, config: RagAppConfig, vector_store: VectorStore) -> ServedApp:
+        app = self.apps[config.name] = ServedApp(config, vector_store, self)
+        return app
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+            "p95_seconds": latencies[int(len(latencies) * 0.95)] if latencies else None,
+            "query_embeddings": self.query_embeddings.stats(),
+            "searches": {name: app.searches.stats() for name, app in self.apps.items()},
+            "models": self.limits.stats(),
+        }
+
+    async def _parse(self, request: web.Request):
+        """The requested app and the JSON body, or a JSON 4xx error"""
+        app = self.apps.get(request.match_info["name"])
+        if app is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": f"no app {request.match_info['name']!r}",
+                                                    "apps": sorted(self.apps)}),
+                                   content_type="application/json")
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or not isinstance(body.get("question"), str) or not body["question"].strip():
+            raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON with a non-empty 'question'"}),
+                                     content_type="application/json")
+        return app, body
+
+    async def ask(self, request: web.Request) -> web.Response:
+        app, body = await self._parse(request)
+        self.requests += 1
+        timings, pieces, final = {}, [], {}
+        async for piece in app.answer(body["question"], body.get("session_id"), timings, stream=False):
+            if isinstance(piece, dict):
+                final = piece
+            else:
+                pieces.append(piece)
+        return web.json_response({"answer": "".join(pieces), **final})
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        app, body = await self._parse(request)
+        self.requests += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        timings = {}
+        async for piece in app.answer(body["question"], body.get("session_id"), timings):
+            event = piece if isinstance(piece, dict) else {"token": piece}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def aclose(self, application: Optional[web.Application] = None):
+        """Close the upstream clients' pooled connections while their event loop still runs"""
+        close = getattr(self.embeddings, "aclose", None)
+        if close is not None:
+            await close()
+        client = getattr(self.llm, "root_async_client", None)
+        if client is not None:
+            await client.close()
+
+    def web_app(self) -> web.Application:
+        application = web.Application()
+        application.add_routes([
+            web.post("/apps/{name}/ask", self.ask),
+            web.post("/apps/{name}/stream", self.stream),
+            web.get("/stats", self.stats_handler),
+        ])
+        application.on_cleanup.append(self.aclose)
+        return application
+
+
+def build_service(app_names: List[str], embeddings: Embeddings, llm: BaseChatModel, **kwargs) -> RagService:
+    service = RagService(embeddings, llm, **kwargs)
+    for name in app_names:
+        config = APPS[name]
+        if not os.path.exists(os.path.join(ROOT, config.source)):
+            print(f"Skipping {name}: {config.source} not found")
+            continue
+        start = time.perf_counter()
+        service.add_app(config, load_app_index(config, embeddings))
+        print(f"Loaded {name} in {time.perf_counter() - start:.1f}s")
+    return service
+
+
+def main():
+    from langchain_openai import ChatOpenAI
+    from common.embedding_executor import EmbeddingExecutor
+    from common.token_budget import local_token_counter
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--app", action="append", choices=sorted(APPS), help="apps to host (default: all)")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--embedding-model", default="text-embedding-ada-002")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"),
+                        help="OpenAI-compatible endpoint, e.g. a local mock")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="in-flight requests per upstream model")
+    parser.add_argument("--max-batch", type=int, default=64, help="queries per embedding and search batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="how long a batch waits to fill")
+    parser.add_argument("--history", help="SQLite file for session chat history (default: in memory)")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    embeddings = EmbeddingExecutor(model=args.embedding_model, api_key=api_key, base_url=args.base_url,
+                                   count_tokens=local_token_counter(), keep_client=True)
+    llm = ChatOpenAI(model=args.model, api_key=api_key, base_url=args.base_url)
+    service = build_service(args.app or sorted(APPS), embeddings, llm,
+                            limits=ModelLimits(default=args.max_concurrency),
+                            history_store=SessionHistoryStore(args.history) if args.history else None,
+                            max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    if not service.apps:
+        sys.exit("No apps to serve")
+    web.run_app(service.web_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Process-wide cache of expensive app resources, rebuilt only when their sources or config change
+
+Streamlit reruns the whole script on every interaction, but imported modules
+survive reruns, so RESOURCES outlives them: clients, vector stores and chains
+are built once per server process and shared by every rerun and session.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from common.index_store import file_sha256
+
+
+@dataclass
+class _Entry:
+    key: Optional[str] = None
+    value: Any = None
+    # Held, not just id()'d: a freed dependency's id can be reused by its replacement
+    depends_on: tuple = ()
+    seconds: float = 0.0
+    built_at: float = 0.0
+    builds: int = 0
+    hits: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ResourceCache:
+    """Named resources keyed by source content hashes, config and dependencies
+
+    get() returns the cached value while the key is unchanged, and otherwise
+    rebuilds it, records how long the build took and why it happened.
+    Source files are only re-hashed when their mtime or size moves.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._hashes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.builds: List[dict] = []
+
+    def _source_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        known = self._hashes.get(path)
+        if known is None or known[0] != signature:
+            known = self._hashes[path] = (signature, file_sha256(path))
+        return known[1]
+
+    def key(self, sources: Iterable[str] = (), config: Optional[dict] = None) -> str:
+        payload = {
+            "sources": {os.path.abspath(path): self._source_hash(path) for path in sources},
+            "config": config or {},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, name: str, build: Callable[[], Any], sources: Iterable[str] = (),
+            config: Optional[dict] = None, depends_on: Sequence[Any] = ()) -> Any:
+        """Return resource `name`, building it first if it's missing or its key changed
+
+        Only a digest of config is kept, so it may hold secrets such as API keys.
+        """
+        key = self.key(list(sources), config)
+        # Dependencies are other cached resources; a rebuilt one is a new object
+        depends_on = tuple(depends_on)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry()
+        # One build per name at a time; other names keep building in parallel
+        with entry.lock:
+            if entry.key == key and len(entry.depends_on) == len(depends_on) and all(
+                    held is dependency for held, dependency in zip(entry.depends_on, depends_on)):
+                entry.hits += 1
+                return entry.value
+            reason = ("initial build" if entry.key is None else
+                      "sources or config changed" if entry.key != key else "a dependency was rebuilt")
+            start = time.perf_counter()
+            value = build()
+            entry.seconds = time.perf_counter() - start
+            entry.key, entry.value, entry.built_at = key, value, time.time()
+            entry.depends_on = depends_on
+            entry.builds += 1
+            self.builds.append({"name": name, "seconds": entry.seconds, "reason": reason, "at": entry.built_at})
+            print(f"Built {name} in {entry.seconds:.2f}s ({reason})")
+            return value
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one resource, or all of them, so the next get() rebuilds it"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def report(self) -> List[dict]:
+        """Per-resource build count, last build time and cache hits"""
+        return [{"name": name, "builds": entry.builds, "last_build_seconds": entry.seconds,
+                 "built_at": entry.built_at, "hits": entry.hits}
+                for name, entry in self._entries.items() if entry.builds]
+
+
+RESOURCES = ResourceCache()
@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langchain_core.runnables.utils import AddableDict
+
+
+def index_version(vector_store) -> str:
+    """Fingerprint of a FAISS store's chunk texts, used to scope cached answers
+
+    Hashes content rather than docstore ids, which are random per build.
+    """
+    ids = vector_store.index_to_docstore_id
+    digest = hashlib.sha1()
+    for position in range(len(ids)):
+        digest.update(vector_store.docstore.search(ids[position]).page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class _ScopeEntries:
+    """One scope's entries: unit vectors in a preallocated matrix, with expiry times, keys and outputs by row"""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires = np.full(capacity, -np.inf)
+        self.keys = [None] * capacity
+        self.outputs = [None] * capacity
+        self.rows = 0
+        self.free = []
+
+    def __len__(self) -> int:
+        return self.rows - len(self.free)
+
+    def add(self, key: int, vector: np.ndarray, output, expires: float) -> int:
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.rows == len(self.keys):
+                # Double the capacity
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.expires = np.concatenate([self.expires, np.full(self.rows, -np.inf)])
+                self.keys += [None] * self.rows
+                self.outputs += [None] * self.rows
+            row = self.rows
+            self.rows += 1
+        self.vectors[row] = vector
+        self.expires[row] = expires
+        self.keys[row] = key
+        self.outputs[row] = output
+        return row
+
+    def remove(self, row: int):
+        self.expires[row] = -np.inf
+        self.keys[row] = self.outputs[row] = None
+        self.free.append(row)
+
+    def best(self, vector: np.ndarray, now: float):
+        """The live row most similar to a unit vector, and its score"""
+        scores = self.vectors[:self.rows] @ vector
+        scores[self.expires[:self.rows] <= now] = -np.inf
+        row = int(np.argmax(scores))
+        return row, scores[row]
+
+    def expired(self, now: float) -> List[int]:
+        return [row for row in np.flatnonzero(self.expires[:self.rows] <= now).tolist()
+                if self.keys[row] is not None]
+
+
+class SemanticCache:
+    """Answers keyed by question embedding, matched by cosine similarity
+
+    Entries are scoped (e.g. to an index version), expire after `ttl` seconds
+    and the least recently used are evicted past `max_entries`. Each scope
+    keeps its vectors in one normalized float32 matrix, so a lookup is a
+    single matrix-vector product; expired rows are skipped by lookups and
+    reclaimed when the scope next stores an answer.
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float = 0.95, ttl: float = 24 * 3600,
+                 max_entries: int = 10_000):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._scopes: Dict[str, _ScopeEntries] = {}
+        # Entry key -> (scope, row), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_key = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed,
+                "hit_rate": self.hit_rate, "entries": len(self._entries)}
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, question: str, scope: str = "", vector: Optional[np.ndarray] = None):
+        """Return (cached output or None, question vector)"""
+        vector = self._embed(question) if vector is None else vector
+        now = time.monotonic()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is not None:
+                row, score = entries.best(vector, now)
+                if score >= self.threshold:
+                    self._entries.move_to_end(entries.keys[row])
+                    self.hits += 1
+                    return entries.outputs[row], vector
+            self.misses += 1
+            return None, vector
+
+    def store(self, vector: np.ndarray, output, scope: str = ""):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                entries = self._scopes[scope] = _ScopeEntries(len(vector))
+            for row in entries.expired(now):
+                del self._entries[entries.keys[row]]
+                entries.remove(row)
+            self._entries[self._next_key] = (scope, entries.add(self._next_key, vector, output, now + self.ttl))
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                _, (evicted_scope, row) = self._entries.popitem(last=False)
+                self._scopes[evicted_scope].remove(row)
+                if not self._scopes[evicted_scope]:
+                    del self._scopes[evicted_scope]
+
+
+def standalone_question(llm: BaseLanguageModel, prompt: BasePromptTemplate,
+                        input_key: str = "input", history_key: str = "chat_history") -> Runnable:
+    """The question as is when there is no chat history, else the LLM's standalone rephrase of it
+
+    The first half of create_history_aware_retriever, so the rephrased
+    question can be looked up in a cache before anything is retrieved. Sync
+    and async callers each get a native path, since a sync-only lambda costs
+    a thread hop per call under ainvoke.
+    """
+    rephrase = prompt | llm | StrOutputParser()
+
+    def question(inputs: dict, config: RunnableConfig) -> str:
+        return rephrase.invoke(inputs, config) if inputs.get(history_key) else inputs[input_key]
+
+    async def aquestion(inputs: dict, config: RunnableConfig) -> str:
+        return await rephrase.ainvoke(inputs, config) if inputs.get(history_key) else inputs[input_key]
+
+    return RunnableLambda(question, afunc=aquestion, name="standalone_question")
+
+
+def with_semantic_cache(rag_chain: Runnable, cache: SemanticCache, scope: Callable[[], str] = lambda: "",
+                        rephrase: Optional[Runnable] = None, input_key: str = "input",
+                        history_key: str = "chat_history", query_key: str = "query") -> Runnable:
+    """Put a semantic cache in front of the retrieval and answer steps of a RAG chain
+
+    With `rephrase` (see standalone_question), follow-ups are rephrased first
+    and looked up by their standalone form, which rag_chain then receives
+    under `query_key` to retrieve with. Without it, only questions with an
+    empty chat history are looked up. Hits are returned without calling the
+    retriever or the answering LLM and carry "cached": True. Misses stream
+    through, so .stream() still yields the context first and then the answer
+    token by token.
+    """
+
+    def stream(inputs: dict, config=None):
+        if not inputs.get(history_key):
+            query = inputs[input_key]
+        elif rephrase is not None:
+            query = rephrase.invoke(inputs, config)
+        else:
+            cache.bypassed += 1
+            yield from rag_chain.stream(inputs, config)
+            return
+        current_scope = scope()
+        cached, vector = cache.lookup(query, current_scope)
+        if cached is not None:
+            yield AddableDict({**inputs, query_key: query, **cached, "cached": True})
+            return
+        output = None
+        for chunk in rag_chain.stream({**inputs, query_key: query}, config):
+            output = chunk if output is None else output + chunk
+            yield chunk
+        cache.store(vector, {"answer": output["answer"], "context": output.get("context", [])}, current_scope)
+
+    # A generator function makes the lambda stream; invoke() adds the chunks back up
+    return RunnableLambda(stream, name="SemanticCache")
@@ -0,0 +1,82 @@
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """L2-normalize each row so that dot products are cosine similarities"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def embed_texts(embeddings: Embeddings, texts: List[str], batch_size: int = 512) -> np.ndarray:
+    """Embed texts in batches and return a normalized float32 matrix"""
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    return normalize_rows(vectors)
+
+
+def iter_blocks(left: np.ndarray, right: np.ndarray, block_rows: int = 1024,
+                block_cols: int = 8192) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """Yield (row_offset, col_offset, cosine block) tiles of left @ right.T
+
+    Only one block_rows x block_cols tile is alive at a time, so memory stays
+    bounded however large N x M gets.
+    """
+    for row in range(0, len(left), block_rows):
+        left_block = left[row:row + block_rows]
+        for col in range(0, len(right), block_cols):
+            yield row, col, left_block @ right[col:col + block_cols].T
+
+
+def top_k(left: np.ndarray, right: np.ndarray, k: int = 5, exclude_self: bool = False,
+          block_rows: int = 1024, block_cols: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k most similar right rows for every left row
+
+    Returns (indices, scores), both shaped (len(left), k) and sorted by
+    descending score. With exclude_self, the diagonal is ignored, which is what
+    you want when matching a set against itself.
+    """
+    k = min(k, len(right) - (1 if exclude_self else 0))
+    best_scores = np.full((len(left), k), -np.inf, dtype=np.float32)
+    best_indices = np.full((len(left), k), -1, dtype=np.int64)
+    for row, col, block in iter_blocks(left, right, block_rows, block_cols):
+        if exclude_self:
+            rows = np.arange(row, row + len(block))
+            inside = (rows >= col) & (rows < col + block.shape[1])
+            block[inside.nonzero()[0], rows[inside] - col] = -np.inf
+        rows_slice = slice(row, row + len(block))
+        # Merge this tile's candidates with the running best and keep k of them
+        scores = np.concatenate([best_scores[rows_slice], block], axis=1)
+        indices = np.concatenate([
+            best_indices[rows_slice],
+            np.broadcast_to(np.arange(col, col + block.shape[1]), block.shape),
+        ], axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores[rows_slice] = np.take_along_axis(scores, keep, axis=1)
+        best_indices[rows_slice] = np.take_along_axis(indices, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_indices, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def pairs_above(left: np.ndarray, right: Optional[np.ndarray] = None, threshold: float = 0.9,
+                block_rows: int = 1024, block_cols: int = 8192) -> List[Tuple[int, int, float]]:
+    """Sparse list of (i, j, score) pairs with cosine similarity >= threshold
+
+    When right is omitted, left is compared against itself and each unordered
+    pair is reported once (i < j).
+    """
+    same = right is None
+    right = left if same else right
+    pairs = []
+    for row, col, block in iter_blocks(left, right, block_rows, block_cols):
+        rows, cols = np.nonzero(block >= threshold)
+        for i, j in zip(rows, cols):
+            if not same or row + i < col + j:
+                pairs.append((int(row + i), int(col + j), float(block[i, j])))
+    pairs.sort(key=lambda pair: -pair[2])
+    return pairs
@@ -0,0 +1,143 @@
+"""Single-pass recursive splitter that works on (start, end) offsets into the source text
+
+Produces the same chunks as RecursiveCharacterTextSplitter with its default
+keep_separator, but splits, merges and strips index ranges instead of copying
+substrings at every level, and records where each chunk came from.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+Span = Tuple[int, int]
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+@lru_cache(maxsize=None)
+def _pattern(separator: str):
+    return re.compile(re.escape(separator))
+
+
+class OffsetTextSplitter(TextSplitter):
+    """Drop-in replacement for RecursiveCharacterTextSplitter that also emits offsets
+
+    Chunks carry metadata["start_index"] and metadata["end_index"] so that
+    text[start_index:end_index] == chunk.page_content. Separators are literal
+    strings and are kept at the start of the piece that follows them. Chunk
+    metadata is a shallow copy of the source document's.
+    """
+
+    def __init__(self, separators: Optional[List[str]] = None, chunk_size: int = 4000,
+                 chunk_overlap: int = 200, length_function: Optional[Callable[[str], int]] = None,
+                 strip_whitespace: bool = True):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                         length_function=length_function or len, keep_separator="start",
+                         strip_whitespace=strip_whitespace)
+        self._separators = separators or DEFAULT_SEPARATORS
+        # Character lengths come straight from the offsets; other measures need the substring
+        self._span_length = None if length_function in (None, len) else length_function
+
+    def _boundaries(self, text: str, start: int, end: int, separator: str) -> List[int]:
+        """Cut points of [start, end) before every occurrence of separator, without empty pieces"""
+        if separator == "":
+            return list(range(start, end + 1))
+        # Matches never overlap, so only one at `start` itself could leave an empty piece
+        bounds = [start]
+        bounds.extend(match.start() for match in _pattern(separator).finditer(text, start, end) if match.start() > start)
+        if end > bounds[-1]:
+            bounds.append(end)
+        return bounds
+
+    def _strip(self, text: str, start: int, end: int) -> Optional[Span]:
+        if self._strip_whitespace:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+        return (start, end) if end > start else None
+
+    def _merge(self, text: str, bounds: List[int], lengths: Optional[List[int]] = None) -> List[Span]:
+        """Greedily pack the contiguous pieces between bounds up to chunk_size, carrying up to chunk_overlap
+
+        With character lengths the running total is just bounds[j] - bounds[first], so
+        both the next chunk boundary and the overlap to carry are found by bisection.
+        """
+        chunks, first, pieces = [], 0, len(bounds) - 1
+        if lengths is None:
+            j = bisect_right(bounds, bounds[first] + self._chunk_size) - 1
+            while j < pieces:
+                # bounds[j + 1] - bounds[first] is the first total that would overflow
+                if j > first:
+                    span = self._strip(text, bounds[first], bounds[j])
+                    if span is not None:
+                        chunks.append(span)
+                    floor = max(bounds[j] - self._chunk_overlap, bounds[j + 1] - self._chunk_size)
+                    first = bisect_left(bounds, floor, first, j)
+                j = max(j + 1, bisect_right(bounds, bounds[first] + self._chunk_size) - 1)
+        else:
+            # Mirrors _merge_splits, which also counts the (empty) join separator
+            total, joiner = 0, self._span_length("")
+            for j, length in enumerate(lengths):
+                if total + length + (joiner if j > first else 0) > self._chunk_size and j > first:
+                    span = self._strip(text, bounds[first], bounds[j])
+                    if span is not None:
+                        chunks.append(span)
+                    while total > self._chunk_overlap or (
+                            total + length + (joiner if j > first else 0) > self._chunk_size and total > 0):
+                        total -= lengths[first] + (joiner if j - first > 1 else 0)
+                        first += 1
+                total += length + (joiner if j > first else 0)
+        span = self._strip(text, bounds[first], bounds[pieces])
+        if span is not None:
+            chunks.append(span)
+        return chunks
+
+    def _split(self, text: str, start: int, end: int, separators: List[str]) -> List[Span]:
+        separator, remaining = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if candidate == "" or text.find(candidate, start, end) != -1:
+                separator, remaining = candidate, separators[i + 1:]
+                break
+
+        bounds = self._boundaries(text, start, end, separator)
+        if self._span_length is None:
+            lengths = None
+            large = [i for i in range(len(bounds) - 1) if bounds[i + 1] - bounds[i] >= self._chunk_size]
+        else:
+            lengths = [self._span_length(text[a:b]) for a, b in zip(bounds, bounds[1:])]
+            large = [i for i, length in enumerate(lengths) if length >= self._chunk_size]
+
+        # Runs of small pieces between the large ones are merged; large pieces recurse
+        chunks, run_start = [], 0
+        for i in large + [len(bounds) - 1]:
+            if i > run_start:
+                chunks.extend(self._merge(text, bounds[run_start:i + 1],
+                                          None if lengths is None else lengths[run_start:i]))
+            if i == len(bounds) - 1:
+                break
+            if remaining:
+                chunks.extend(self._split(text, bounds[i], bounds[i + 1], remaining))
+            else:
+                chunks.append((bounds[i], bounds[i + 1]))
+            run_start = i + 1
+        return chunks
+
+    def split_spans(self, text: str) -> List[Span]:
+        """(start, end) offsets of every chunk, without building the chunk strings"""
+        return self._split(text, 0, len(text), self._separators)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def create_documents(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
+        texts = list(texts)
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            for start, end in self.split_spans(text):
+                documents.append(Document(page_content=text[start:end],
+                                          metadata=dict(metadata, start_index=start, end_index=end)))
+        return documents
@@ -0,0 +1,94 @@
+"""Render chain output token by token and time it
+
+TextStream turns a chain's .stream() into the plain text pieces
+st.write_stream expects, whether the chain yields message chunks, strings,
+or create_retrieval_chain dicts (where only the answer key is text).
+"""
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration
+from langchain_core.prompt_values import PromptValue
+
+# Time to first token and total latency of recent streams, for reporting
+STREAM_TIMINGS = deque(maxlen=1000)
+
+
+class TextStream:
+    """Iterable of text pieces from a chain's .stream(), recording time to first token
+
+    With `key`, chunks are dicts and only that key is rendered; the other keys
+    (the retrieved context, which create_retrieval_chain emits before the
+    answer) are collected in `extras`. The full text is in `text` afterwards.
+    """
+
+    def __init__(self, chunks: Iterable[Any], key: Optional[str] = None, name: str = "stream"):
+        self.chunks = chunks
+        self.key = key
+        self.name = name
+        self.extras: Dict[str, Any] = {}
+        self.text = ""
+        self.first_token_seconds: Optional[float] = None
+        self.seconds: Optional[float] = None
+
+    def _piece(self, chunk: Any) -> str:
+        if self.key is not None:
+            for name, value in chunk.items():
+                if name != self.key:
+                    self.extras[name] = value
+            chunk = chunk.get(self.key, "")
+        if isinstance(chunk, BaseMessageChunk):
+            chunk = chunk.content
+        return chunk if isinstance(chunk, str) else ""
+
+    def __iter__(self) -> Iterator[str]:
+        # .stream() is lazy, so the request starts with the first next()
+        start = time.perf_counter()
+        pieces = []
+        for chunk in self.chunks:
+            piece = self._piece(chunk)
+            if piece:
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - start
+                pieces.append(piece)
+                yield piece
+        self.seconds = time.perf_counter() - start
+        self.text = "".join(pieces)
+        STREAM_TIMINGS.append({"name": self.name, "first_token_seconds": self.first_token_seconds,
+                               "seconds": self.seconds, "characters": len(self.text)})
+
+    def summary(self) -> str:
+        if self.seconds is None:
+            return "Not streamed yet"
+        if self.first_token_seconds is None:
+            return f"No text in {self.seconds:.2f}s"
+        return f"First token after {self.first_token_seconds:.2f}s, full answer in {self.seconds:.2f}s"
+
+
+def stream_through_cache(llm: BaseChatModel, prompt: PromptValue) -> Iterator[AIMessageChunk]:
+    """llm.stream(prompt), but served from and saved to the model's cache= like invoke() is
+
+    langchain only consults the cache on invoke(), so streaming would
+    otherwise pay for every repeated prompt. Entries are keyed exactly as
+    invoke() keys them, so the two paths share hits.
+    """
+    cache = llm.cache
+    if not isinstance(cache, BaseCache):
+        yield from llm.stream(prompt)
+        return
+    messages: List[BaseMessage] = prompt.to_messages()
+    key, llm_string = dumps(messages), llm._get_llm_string()
+    cached = cache.lookup(key, llm_string)
+    if cached:
+        yield AIMessageChunk(content=cached[0].text)
+        return
+    pieces = []
+    for chunk in llm.stream(messages):
+        pieces.append(chunk.content)
+        yield chunk
+    cache.update(key, llm_string, [ChatGeneration(message=AIMessage(content="".join(pieces)))])
@@ -0,0 +1,57 @@
+import itertools
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Union
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pypdf import PdfReader
+
+
+def iter_pdf_pages(pdf: Union[str, BinaryIO], source: Optional[str] = None) -> Iterator[Document]:
+    """Yield one Document per PDF page, extracting text only when the page is reached"""
+    reader = PdfReader(pdf)
+    source = source or (pdf if isinstance(pdf, str) else getattr(pdf, "name", "upload.pdf"))
+    for number, page in enumerate(reader.pages):
+        yield Document(page_content=page.extract_text() or "",
+                       metadata={"source": source, "page": number, "total_pages": len(reader.pages)})
+
+
+def iter_chunks(pages: Iterable[Document], splitter) -> Iterator[Document]:
+    """Split page by page so that only one page's chunks exist at a time"""
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def page_fraction(metadata: dict, sources: List[str]) -> float:
+    """Overall progress through `sources` given the metadata of the latest chunk"""
+    within = (metadata["page"] + 1) / metadata["total_pages"]
+    return (sources.index(metadata["source"]) + within) / len(sources)
+
+
+def ingest_stream(chunks: Iterable[Document], embeddings: Embeddings, vector_store: Optional[FAISS] = None,
+                  batch_size: int = 64, on_progress: Optional[Callable[[dict], None]] = None) -> Optional[FAISS]:
+    """Embed chunks in fixed-size batches and append each batch to the index
+
+    Peak memory is bounded by batch_size rather than by document size.
+    on_progress receives the running chunk and batch counts plus the
+    metadata of the batch's last chunk (e.g. its page) after every batch.
+    """
+    chunks_done = 0
+    for number, batch in enumerate(batched(chunks, batch_size), start=1):
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+        chunks_done += len(batch)
+        if on_progress:
+            on_progress({"chunks": chunks_done, "batches": number, "last": batch[-1].metadata})
+    return vector_store
@@ -0,0 +1,115 @@
+"""Token-sized chunks and exact-budget context packing for the stuff-documents step
+
+Chunks from TokenBudgetSplitter carry their token count in metadata["tokens"]
+and the encoding it was counted in in metadata["token_encoding"], so packing
+retrieved context into a budget is additions, not re-tokenizing.
+"""
+import warnings
+from functools import lru_cache, partial
+from operator import itemgetter
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from common.embedding_executor import approximate_tokens, token_counter
+from common.splitter import OffsetTextSplitter
+
+TOKENS_KEY = "tokens"
+ENCODING_KEY = "token_encoding"
+APPROXIMATE_ENCODING = "approx"
+
+
+@lru_cache(maxsize=None)
+def local_token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """tiktoken's counter when the encoding can be loaded, else the ~4 characters/token estimate"""
+    try:
+        return token_counter(encoding_name)
+    except (OSError, ValueError) as e:
+        # tiktoken downloads encodings on first use, so offline machines land here
+        warnings.warn(f"Cannot load the {encoding_name} tokenizer ({e}); "
+                      f"counting tokens as ~4 characters each instead", stacklevel=2)
+        return approximate_tokens
+
+
+def counter_encoding(count_tokens: Callable[[str], int]) -> Optional[str]:
+    """The encoding a token counter counts in: its tiktoken encoding, "approx" for the estimate, None if unknown"""
+    if count_tokens is approximate_tokens:
+        return APPROXIMATE_ENCODING
+    return getattr(count_tokens, "encoding", None)
+
+
+class TokenBudgetSplitter(OffsetTextSplitter):
+    """OffsetTextSplitter sized in tokens that stores each chunk's token count with it"""
+
+    def __init__(self, chunk_tokens: int = 250, overlap_tokens: int = 50,
+                 count_tokens: Optional[Callable[[str], int]] = None, separators: Optional[List[str]] = None):
+        self.count_tokens = count_tokens or local_token_counter()
+        self.encoding = counter_encoding(self.count_tokens)
+        super().__init__(separators=separators, chunk_size=chunk_tokens, chunk_overlap=overlap_tokens,
+                         length_function=self.count_tokens)
+
+    def create_documents(self, texts, metadatas=None) -> List[Document]:
+        documents = super().create_documents(texts, metadatas)
+        for document in documents:
+            document.metadata[TOKENS_KEY] = self.count_tokens(document.page_content)
+            if self.encoding is not None:
+                document.metadata[ENCODING_KEY] = self.encoding
+        return documents
+
+
+def make_splitter(chunk_size: int, chunk_overlap: int, chunk_unit: str = "chars") -> OffsetTextSplitter:
+    """Splitter for the chunk settings recorded in index manifests"""
+    if chunk_unit == "tokens":
+        return TokenBudgetSplitter(chunk_tokens=chunk_size, overlap_tokens=chunk_overlap)
+    return OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def document_tokens(document: Document, count_tokens: Callable[[str], int]) -> int:
+    """Token count of a chunk, counted at most once per encoding and then kept in its metadata"""
+    tokens = document.metadata.get(TOKENS_KEY)
+    encoding = counter_encoding(count_tokens)
+    if tokens is None or (encoding is not None and document.metadata.get(ENCODING_KEY, encoding) != encoding):
+        tokens = document.metadata[TOKENS_KEY] = count_tokens(document.page_content)
+        if encoding is not None:
+            document.metadata[ENCODING_KEY] = encoding
+    return tokens
+
+
+def pack_documents(documents: List[Document], max_tokens: int,
+                   count_tokens: Optional[Callable[[str], int]] = None,
+                   separator: str = "\n\n") -> List[Document]:
+    """Keep documents in rank order while they fit in max_tokens, skipping any that would overflow
+
+    The budget includes the separator create_stuff_documents_chain joins
+    documents with.
+    """
+    count_tokens = count_tokens or local_token_counter()
+    joiner = count_tokens(separator)
+    packed, used = [], 0
+    for document in documents:
+        tokens = document_tokens(document, count_tokens) + (joiner if packed else 0)
+        if used + tokens <= max_tokens:
+            packed.append(document)
+            used += tokens
+    return packed
+
+
+def budgeted_retriever(retriever: Runnable, max_tokens: int,
+                       count_tokens: Optional[Callable[[str], int]] = None) -> Runnable:
+    """Pack a retriever's results into max_tokens of context before they are stuffed into the prompt
+
+    Give the retriever a larger k than the budget needs, so packing has
+    candidates to choose from. The result takes create_retrieval_chain's input dict.
+    """
+    if isinstance(retriever, BaseRetriever):
+        # create_retrieval_chain only extracts "input" for BaseRetriever instances
+        retriever = RunnableLambda(itemgetter("input")) | retriever
+    pack = partial(pack_documents, max_tokens=max_tokens, count_tokens=count_tokens)
+
+    async def apack(documents: List[Document]) -> List[Document]:
+        # Packing is additions; not worth the thread hop a sync lambda takes under ainvoke
+        return pack(documents)
+
+    return retriever | RunnableLambda(pack, afunc=apack)
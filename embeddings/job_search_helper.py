@@ -1,17 +1,21 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from common.embedding_cache import CachedEmbeddings
+from common.splitter import OffsetTextSplitter
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-llm = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+llm = CachedEmbeddings(OpenAIEmbeddings(api_key=OPENAI_API_KEY))
 
 document = TextLoader("job_listings.txt").load()
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=200,
-                                               chunk_overlap=10)
+text_splitter = OffsetTextSplitter(chunk_size=200,
+                                   chunk_overlap=10)
 chunks = text_splitter.split_documents(document)
 db = FAISS.from_documents(chunks, llm)
+print(f"Embedding cache: {llm.hits} hits, {llm.misses} misses")
 retriever = db.as_retriever()
 text = input("Enter a query")
 
@@ -1,15 +1,49 @@
 import os
+import sys
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import OpenAIEmbeddings
 import numpy as np
+from common.similarity import embed_texts, normalize_rows, top_k, pairs_above
+
+
+def read_texts(path):
+    """One text per non-empty line"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+parser = argparse.ArgumentParser(description="Compare texts by cosine similarity")
+parser.add_argument("--left", help="file with one text per line (enables all-pairs mode)")
+parser.add_argument("--right", help="file to match against; defaults to --left (dedupe)")
+parser.add_argument("--top-k", type=int, default=3)
+parser.add_argument("--threshold", type=float, help="print all pairs above this score instead of top-k")
+parser.add_argument("--batch-size", type=int, default=512)
+args = parser.parse_args()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 llm = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
 
-text1 = input("Enter a text1: ")
-text2 = input("Enter a text2: ")
-response1 = llm.embed_query(text1)
-response2 = llm.embed_query(text2)
+if args.left:
+    left_texts = read_texts(args.left)
+    right_texts = read_texts(args.right) if args.right else left_texts
+    left = embed_texts(llm, left_texts, args.batch_size)
+    right = embed_texts(llm, right_texts, args.batch_size) if args.right else left
+
+    if args.threshold is not None:
+        for i, j, score in pairs_above(left, None if not args.right else right, args.threshold):
+            print(f"{score * 100:.1f}%\t{left_texts[i][:60]}\t{right_texts[j][:60]}")
+    else:
+        indices, scores = top_k(left, right, args.top_k, exclude_self=not args.right)
+        for i, text in enumerate(left_texts):
+            print(text[:80])
+            for j, score in zip(indices[i], scores[i]):
+                print(f"    {score * 100:.1f}%  {right_texts[j][:80]}")
+else:
+    text1 = input("Enter a text1: ")
+    text2 = input("Enter a text2: ")
+    response1, response2 = normalize_rows(llm.embed_documents([text1, text2]))
 
-similarity_score = np.dot(response1, response2)
+    similarity_score = np.dot(response1, response2)
 
-print(similarity_score*100, "%")
\ No newline at end of file
+    print(similarity_score*100, "%")
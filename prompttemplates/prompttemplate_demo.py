@@ -1,13 +1,17 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import streamlit as st
+from common.llm_cache import get_response_cache
 # from langchain.globals import set_debug
 
 # set_debug(True)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
+response_cache = get_response_cache()
+llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY, cache=response_cache)
 
 prompt_template = PromptTemplate(
     input_variable=["country"],
@@ -29,6 +33,9 @@ country = st.text_input("Enter a country: ")
 number_of_paragraphs = st.number_input("Enter a number of paragraphs: ", min_value=1, max_value=7)
 language = st.text_input("Enter a language: ")
 
+fresh = st.checkbox("Fresh answer (skip cache)")
+
 if country and number_of_paragraphs and language:
-    response = llm.invoke(prompt_template.format(country=country, number_of_paragraphs=number_of_paragraphs, language=language))
+    with response_cache.bypass(fresh):
+        response = llm.invoke(prompt_template.format(country=country, number_of_paragraphs=number_of_paragraphs, language=language))
     st.write(response.content)
\ No newline at end of file
@@ -1,13 +1,17 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import streamlit as st
+from common.llm_cache import get_response_cache
 # from langchain.globals import set_debug
 
 # set_debug(True)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
+response_cache = get_response_cache()
+llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY, cache=response_cache)
 
 prompt_template = PromptTemplate(
     input_variable=["city", "month", "language", "budget"],
@@ -31,9 +35,12 @@ month = st.text_input("Enter a month of travel: ")
 language = st.text_input("Enter a language: ")
 budget = st.selectbox("Travel Budget", ["Low", "Medium", "High"])
 
+fresh = st.checkbox("Fresh answer (skip cache)")
+
 if city and month and language and budget:
-    response = llm.invoke(prompt_template.format(
-        city=city, month=month, language=language, budget=budget
+    with response_cache.bypass(fresh):
+        response = llm.invoke(prompt_template.format(
+            city=city, month=month, language=language, budget=budget
 
-    ))
+        ))
     st.write(response.content)
\ No newline at end of file
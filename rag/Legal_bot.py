@@ -1,59 +1,81 @@
 import os
+import sys
+import uuid
+from dataclasses import asdict
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_retrieval_chain, create_history_aware_retriever
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.chat_history import get_history_store
+from common.embedding_cache import CachedEmbeddings
+from common.history_window import HistoryCompactor
+from common.rag_apps import APPS, ROOT, answer_chain, app_retriever, load_app_index, rephrase_question
+from common.resources import RESOURCES
+from common.semantic_cache import SemanticCache, index_version, with_semantic_cache
+from common.streaming import TextStream
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
-
-
-
-document = TextLoader("Legal_Document_Analysis_Data.txt").load()
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000,
-                                               chunk_overlap=200)
-chunks = text_splitter.split_documents(document)
-vector_store = FAISS.from_documents(chunks, embeddings)
-retriever = vector_store.as_retriever()
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        ("system", """You are an assistant for answering questions.
-                    Use the provided context to respond.If the answer 
-                    isn't clear, acknowledge that you don't know. 
-                    Limit your response to three concise sentences.
-                    {context}"""),
-                    MessagesPlaceholder(variable_name="chat_history"),
-        ("human", "{input}")
-    ]
-)
+# Prompt, chunking and retrieval settings are shared with the RAG service. Prebuild the index with
+#     python common/build_index.py rag/Legal_Document_Analysis_Data.txt --out rag/indexes/legal \
+#         --chunk-size 250 --chunk-overlap 50 --chunk-unit tokens
+APP = APPS["legal"]
+SOURCE = os.path.join(ROOT, APP.source)
+MANIFEST = os.path.join(ROOT, APP.index_path, "manifest.json")
+
+# Everything below is built once per server process and reused by every rerun
+# and session, until the source file, prebuilt index or settings change
+embeddings = RESOURCES.get("legal_bot.embeddings",
+                           lambda: CachedEmbeddings(OpenAIEmbeddings(api_key=OPENAI_API_KEY)),
+                           config={"api_key": OPENAI_API_KEY})
+llm = RESOURCES.get("legal_bot.llm", lambda: ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY),
+                    config={"model": "gpt-4o", "api_key": OPENAI_API_KEY})
 
+index_files = [MANIFEST] if os.path.exists(MANIFEST) else []
+vector_store = RESOURCES.get("legal_bot.vector_store", lambda: load_app_index(APP, embeddings),
+                             sources=[SOURCE] + index_files, config=asdict(APP), depends_on=[embeddings])
+# Retrieves with the standalone question that with_semantic_cache rephrases, looks up and passes as "query"
+rag_chain = RESOURCES.get("legal_bot.rag_chain", lambda: answer_chain(APP, llm, app_retriever(APP, vector_store)),
+                          config=asdict(APP), depends_on=[llm, vector_store])
 
-history_aware_retriever = create_history_aware_retriever(llm, retriever, prompt_template)
-qa_chain = create_stuff_documents_chain(llm, prompt_template)
-rag_chain = create_retrieval_chain(history_aware_retriever, qa_chain)
+# One semantic answer cache per server process, shared across reruns and sessions
+answer_cache = RESOURCES.get("legal_bot.answer_cache", lambda: SemanticCache(embeddings, threshold=0.95),
+                             depends_on=[embeddings])
+cache_scope = RESOURCES.get("legal_bot.index_version", lambda: index_version(vector_store),
+                            depends_on=[vector_store])
 
-history_for_chain = StreamlitChatMessageHistory()
+history_store = get_history_store()
+# Older turns are summarized in the background so the prompt stays within a fixed history budget
+history_compactor = RESOURCES.get("legal_bot.history_compactor",
+                                  lambda: HistoryCompactor(llm, history_store, max_tokens=1000),
+                                  config={"max_tokens": 1000}, depends_on=[llm])
+# The session id rides along in the URL, so a reload or server restart resumes the conversation
+session_id = st.session_state.setdefault("session_id", st.query_params.get("session") or uuid.uuid4().hex)
+st.query_params["session"] = session_id
 
 chain_with_history = RunnableWithMessageHistory(
-    rag_chain,
-    lambda session_id:history_for_chain,
+    with_semantic_cache(rag_chain, answer_cache, scope=lambda: cache_scope,
+                        rephrase=rephrase_question(llm)),
+    history_compactor.history,
     input_messages_key="input",
-    history_messages_key="chat_history"
+    history_messages_key="chat_history",
+    output_messages_key="answer"
 )
 
 
 st.write("Chat with Document")
+st.caption(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+for resource in RESOURCES.report():
+    st.sidebar.caption(f"{resource['name']}: built {resource['builds']}x, last build "
+                       f"{resource['last_build_seconds']:.2f}s, reused {resource['hits']}x")
 question = st.text_input("Ask your Question: ")
 
 if question:
-    response = chain_with_history.invoke({"input": question},
-        {"configurable":{"session_id":"abc123"}
-    })
-    st.write(response['answer'])
\ No newline at end of file
+    # The context is retrieved first, then the answer streams in token by token
+    answer = TextStream(chain_with_history.stream({"input": question},
+        {"configurable":{"session_id":session_id}
+    }), key="answer", name="legal_bot")
+    st.write_stream(answer)
+    st.caption(f"{answer.summary()}; answer cache hit rate: {answer_cache.hit_rate:.0%}")
+    history_report = history_compactor.last_report(session_id)
+    st.caption(f"History: {history_report['prompt_tokens']} prompt tokens, "
+               f"{history_report['saved_tokens']} saved by summarizing older turns")
\ No newline at end of file
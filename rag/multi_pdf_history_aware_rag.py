@@ -1,14 +1,17 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_retrieval_chain, create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.dedup import iter_deduplicate
+from common.loaders import iter_upload
+from common.streaming_ingest import ingest_stream, iter_chunks, page_fraction
+from common.token_budget import TokenBudgetSplitter, budgeted_retriever
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
@@ -19,20 +22,35 @@ st.write("Chat with Document")
 uploaded_files = st.file_uploader("Choose PDF files", type="pdf", accept_multiple_files=True)
 
 if uploaded_files:
-    all_chunks = []
-    for uploaded_file in uploaded_files:
-        # Save the uploaded file temporarily
-        with open(f"temp_{uploaded_file.name}", "wb") as f:
-            f.write(uploaded_file.getbuffer())
+    def pages():
+        # Parsed straight from each upload's buffer; no temp files to collide across sessions
+        for uploaded_file in uploaded_files:
+            yield from iter_upload(uploaded_file.getbuffer(), uploaded_file.name)
 
-        # Load PDF document
-        document = PyPDFLoader(f"temp_{uploaded_file.name}").load()
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        chunks = text_splitter.split_documents(document)
-        all_chunks.extend(chunks)
+    text_splitter = TokenBudgetSplitter(chunk_tokens=250, overlap_tokens=25)
+    file_names = [uploaded_file.name for uploaded_file in uploaded_files]
+    progress = st.progress(0.0, text="Indexing documents...")
 
-    vector_store = FAISS.from_documents(all_chunks, embeddings)
-    retriever = vector_store.as_retriever()
+    # Pages stream through the splitter and the dedup stage into fixed-size
+    # embedding batches. Boilerplate repeated across files (headers,
+    # disclaimers) is embedded once; the kept chunk's metadata["sources"]
+    # lists every file/page it came from
+    dedup_report = {}
+    vector_store = ingest_stream(
+        iter_deduplicate(iter_chunks(pages(), text_splitter), threshold=0.85, report=dedup_report),
+        embeddings,
+        batch_size=64,
+        on_progress=lambda p: progress.progress(
+            page_fraction(p["last"], file_names),
+            text=f"Indexed {p['last']['source']} page {p['last']['page'] + 1} ({p['chunks']} chunks)")
+    )
+    progress.empty()
+    if vector_store is None:
+        st.error("No text could be extracted from these PDFs.")
+        st.stop()
+    st.caption(f"Removed {dedup_report['dropped']} near-duplicate chunks of {dedup_report['chunks_in']}")
+
+    retriever = vector_store.as_retriever(search_kwargs={"k": 8})
     prompt_template = ChatPromptTemplate.from_messages(
         [
             ("system", """You are an assistant for answering questions.
@@ -48,7 +66,7 @@ if uploaded_files:
 
     history_aware_retriever = create_history_aware_retriever(llm, retriever, prompt_template)
     qa_chain = create_stuff_documents_chain(llm, prompt_template)
-    rag_chain = create_retrieval_chain(history_aware_retriever, qa_chain)
+    rag_chain = create_retrieval_chain(budgeted_retriever(history_aware_retriever, max_tokens=1000), qa_chain)
 
     history_for_chain = StreamlitChatMessageHistory()
 
@@ -1,17 +1,20 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_retrieval_chain, create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.embedding_cache import CachedEmbeddings
+from common.loaders import iter_upload
+from common.streaming_ingest import ingest_stream, iter_chunks, page_fraction
+from common.token_budget import TokenBudgetSplitter, budgeted_retriever
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+embeddings = CachedEmbeddings(OpenAIEmbeddings(api_key=OPENAI_API_KEY))
 llm = ChatOpenAI(model="gpt-4o", api_key=OPENAI_API_KEY)
 
 st.write("Chat with Document")
@@ -19,16 +22,24 @@ st.write("Chat with Document")
 uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
 
 if uploaded_file is not None:
-    # Save the uploaded file temporarily
-    with open("temp.pdf", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
-    # Load PDF document
-    document = PyPDFLoader("temp.pdf").load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(document)
-    vector_store = FAISS.from_documents(chunks, embeddings)
-    retriever = vector_store.as_retriever()
+    # Stream pages straight from the upload buffer (no temp file, nothing shared
+    # between sessions) through the splitter into fixed-size embedding batches
+    text_splitter = TokenBudgetSplitter(chunk_tokens=250, overlap_tokens=25)
+    progress = st.progress(0.0, text="Indexing document...")
+    vector_store = ingest_stream(
+        iter_chunks(iter_upload(uploaded_file.getbuffer(), uploaded_file.name), text_splitter),
+        embeddings,
+        batch_size=64,
+        on_progress=lambda p: progress.progress(
+            page_fraction(p["last"], [uploaded_file.name]),
+            text=f"Indexed page {p['last']['page'] + 1} of {p['last']['total_pages']} ({p['chunks']} chunks)")
+    )
+    progress.empty()
+    if vector_store is None:
+        st.error("No text could be extracted from this PDF.")
+        st.stop()
+    st.caption(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+    retriever = vector_store.as_retriever(search_kwargs={"k": 8})
     prompt_template = ChatPromptTemplate.from_messages(
         [
             ("system", """You are an assistant for answering questions.
@@ -44,7 +55,7 @@ if uploaded_file is not None:
 
     history_aware_retriever = create_history_aware_retriever(llm, retriever, prompt_template)
     qa_chain = create_stuff_documents_chain(llm, prompt_template)
-    rag_chain = create_retrieval_chain(history_aware_retriever, qa_chain)
+    rag_chain = create_retrieval_chain(budgeted_retriever(history_aware_retriever, max_tokens=1000), qa_chain)
 
     history_for_chain = StreamlitChatMessageHistory()
 
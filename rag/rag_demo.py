@@ -1,42 +1,27 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
+from common.embedding_cache import CachedEmbeddings
+from common.rag_apps import APPS, app_chain, app_retriever, load_app_index
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+embeddings = CachedEmbeddings(OpenAIEmbeddings(api_key=OPENAI_API_KEY))
 llm = ChatOpenAI(model = "gpt-4o", api_key=OPENAI_API_KEY)
 
+# Prompt, chunking and retrieval settings are shared with the RAG service. Prebuild the index with
+#     python common/build_index.py rag/product-data.txt --out rag/indexes/product \
+#         --chunk-size 250 --chunk-overlap 50 --chunk-unit tokens
+APP = APPS["product"]
 
-
-document = TextLoader("product-data.txt").load()
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000,
-                                               chunk_overlap=200)
-chunks = text_splitter.split_documents(document)
-vector_store = FAISS.from_documents(chunks, embeddings)
-retriever = vector_store.as_retriever()
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        ("system", """You are an assistant for answering questions.
-                    Use the provided context to respond.If the answer 
-                    isn't clear, acknowledge that you don't know. 
-                    Limit your response to three concise sentences.
-                    {context}"""),
-        ("human", "{input}")
-    ]
-)
-
-qa_chain = create_stuff_documents_chain(llm, prompt_template)
-rag_chain = create_retrieval_chain(retriever, qa_chain)
+vector_store = load_app_index(APP, embeddings)
+print(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+rag_chain = app_chain(APP, llm, app_retriever(APP, vector_store))
 
 print("Chat with Document")
 question = input("Ask your Question: ")
 
 if question:
     response = rag_chain.invoke({"input": question})
-    print(response['answer'])
\ No newline at end of file
+    print(response['answer'])
@@ -1,8 +1,12 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 import datetime
+from common.llm_cache import get_response_cache
+from common.streaming import TextStream, stream_through_cache
 
 # account for deprecation of LLM model
 # Get the current date
@@ -36,20 +40,17 @@ prompt = PromptTemplate(
     template=prompt_template
 )
 
-# Initialize the language model
-llm = ChatOpenAI(model=llm_model, temperature=0.0, api_key=OPENAI_API_KEY)
+# Initialize the language model; temperature 0 makes identical requests safe to serve from cache
+llm = ChatOpenAI(model=llm_model, temperature=0.0, api_key=OPENAI_API_KEY, cache=get_response_cache())
 
-# Create the RunnableSequence
-llm_chain = prompt | llm
-
-# Define the function to create a meal plan
+# Define the function to create a meal plan; it streams, and repeat requests still come from the cache
 def create_meal_plan(num_days, dietary_restrictions, caloric_requirement):
-    response = llm_chain.invoke({
+    prompt_value = prompt.invoke({
         "num_days": num_days,
         "dietary_restrictions": dietary_restrictions,
         "caloric_requirement": caloric_requirement
     })
-    return response.content
+    return TextStream(stream_through_cache(llm, prompt_value), name="meal_planner")
 
 # Streamlit application
 st.title("Meal Plan Generator")
@@ -63,6 +64,7 @@ calorie_requirement = st.number_input("Daily caloric requirement (in kcal)", min
 if st.button("Generate Meal Plan"):
     if diet_restrictions and calorie_requirement:
         meal_plan = create_meal_plan(days, diet_restrictions, calorie_requirement)
-        st.write(meal_plan)
+        st.write_stream(meal_plan)
+        st.caption(meal_plan.summary())
     else:
         st.error("Please enter dietary restrictions and caloric requirement.")
\ No newline at end of file
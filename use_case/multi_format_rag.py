@@ -1,39 +1,23 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_unstructured import UnstructuredLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_retrieval_chain, create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.embedding_cache import CachedEmbeddings
+from common.embedding_executor import EmbeddingExecutor
+from common.incremental_index import IncrementalIndexer
+from common.partition import partition_file, throughput_by_format
+from common.resources import RESOURCES
+from common.splitter import OffsetTextSplitter
 
-
-def load_documents(folder_path):
-    """Load documents from multiple file formats"""
-    documents = []
-    supported_extensions = ['.pdf', '.doc', '.docx', '.txt', '.rtf']
-    UNSTRUCTURED_API_KEY = os.getenv("UNSTRUCTURED_API_KEY")
-
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        file_extension = os.path.splitext(file_name)[1].lower()
-
-        if file_extension in supported_extensions:
-            try:
-                loader = UnstructuredLoader(file_path,
-                            api_key=UNSTRUCTURED_API_KEY,
-                            partition_via_api=True,
-                            chunking_strategy="by_title",
-                            strategy="fast")
-                documents.extend(loader.load())
-                print(f"Successfully loaded: {file_name}")
-            except Exception as e:
-                print(f"Error loading {file_name}: {str(e)}")
-
-    return documents
+SUPPORTED_EXTENSIONS = ['.pdf', '.doc', '.docx', '.txt', '.rtf']
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
 
 
 def setup_qa_chain():
@@ -43,20 +27,33 @@ def setup_qa_chain():
         st.error("Please set your OPENAI_API_KEY environment variable")
         st.stop()
 
-    embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-    llm = ChatOpenAI(model="gpt-4", api_key=OPENAI_API_KEY)
+    # Built once per server process, not on every rerun
+    embeddings = RESOURCES.get("multi_format_rag.embeddings",
+                               lambda: CachedEmbeddings(EmbeddingExecutor(api_key=OPENAI_API_KEY, max_concurrency=4)),
+                               config={"api_key": OPENAI_API_KEY})
+    llm = RESOURCES.get("multi_format_rag.llm", lambda: ChatOpenAI(model="gpt-4", api_key=OPENAI_API_KEY),
+                        config={"model": "gpt-4", "api_key": OPENAI_API_KEY})
 
     return embeddings, llm
 
 
-def create_qa_system(documents, embeddings, llm):
-    """Create the QA system with vector store and retrieval chain"""
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(documents)
+def index_folder(folder_path, embeddings, max_workers=None):
+    """Bring the folder's index up to date, re-embedding only added or changed files"""
+    # The loaded FAISS index stays in memory across reruns; each rerun only syncs the changes
+    indexer = RESOURCES.get(
+        "multi_format_rag.indexer",
+        lambda: IncrementalIndexer(os.path.join(folder_path, ".index"), embeddings,
+                                   OffsetTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP),
+                                   load_file=partition_file, extensions=SUPPORTED_EXTENSIONS),
+        config={"folder": os.path.abspath(folder_path), "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+        depends_on=[embeddings])
+    indexer.max_workers = max_workers
+    report = indexer.sync(folder_path)
+    return indexer.vector_store, report
 
-    # Create vector store
-    vector_store = FAISS.from_documents(chunks, embeddings)
+
+def create_qa_system(vector_store, llm):
+    """Create the QA system with vector store and retrieval chain"""
     retriever = vector_store.as_retriever()
 
     # Set up prompt template
@@ -95,15 +92,25 @@ def main():
         st.error("Folder path does not exist")
         return
 
-    # Load documents and set up QA system
-    documents = load_documents(folder_path)
+    max_workers = st.sidebar.number_input("Document loading workers", min_value=1, max_value=64,
+                                          value=os.cpu_count() or 1)
 
-    if not documents:
+    # Index new or changed documents and set up QA system
+    embeddings, llm = setup_qa_chain()
+    vector_store, report = index_folder(folder_path, embeddings, int(max_workers))
+
+    if vector_store is None or not vector_store.index_to_docstore_id:
         st.error("No supported documents found in the specified folder")
         return
 
-    embeddings, llm = setup_qa_chain()
-    rag_chain = create_qa_system(documents, embeddings, llm)
+    st.caption(f"Index sync: {report['added']} added, {report['changed']} changed, "
+               f"{report['removed']} removed in {report['seconds']:.1f}s")
+    for kind, total in throughput_by_format(report["loads"]).items():
+        st.caption(f"{kind}: {total['files']} files, {total['megabytes']:.2f} MB at "
+                   f"{total['mb_per_second']:.2f} MB/s")
+    rag_chain = RESOURCES.get("multi_format_rag.rag_chain", lambda: create_qa_system(vector_store, llm),
+                              depends_on=[llm, vector_store])
+    st.caption(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
 
     # Set up chat history
     history_for_chain = StreamlitChatMessageHistory()
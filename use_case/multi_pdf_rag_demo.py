@@ -1,32 +1,48 @@
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 import streamlit as st
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import PyPDFLoader # install pypdf package
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_retrieval_chain, create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from common.ann_index import from_documents
+from common.embedding_executor import EmbeddingExecutor
+from common.index_store import ManifestMismatchError, load_index
+from common.loaders import load_files_parallel
+from common.splitter import OffsetTextSplitter
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+embeddings = EmbeddingExecutor(api_key=OPENAI_API_KEY, max_concurrency=4)
 llm = ChatOpenAI(model="gpt-4o", api_key=OPENAI_API_KEY)
 
 # Specify the folder containing the PDF files
 folder_path = "C:/Users/tolukoga/PycharmProjects/langchaindemo/use_case/benefits"
 
-# Load all PDF files in the folder
-documents = []
-for file_name in os.listdir(folder_path):
-    if file_name.endswith(".pdf"):
-        file_path = os.path.join(folder_path, file_name)
-        documents.extend(PyPDFLoader(file_path).load())
+INDEX_PATH = os.path.join(folder_path, "index")
+pdf_paths = [os.path.join(folder_path, file_name) for file_name in sorted(os.listdir(folder_path))
+             if file_name.endswith(".pdf")]
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-chunks = text_splitter.split_documents(documents)
-vector_store = FAISS.from_documents(chunks, embeddings)
+vector_store = None
+if os.path.exists(INDEX_PATH):
+    # Prebuilt with: python common/bulk_ingest.py <folder_path>/*.pdf --out <folder_path>/index --chunk-overlap 100
+    # (checkpointed; rerun the same command to resume an interrupted build)
+    try:
+        vector_store = load_index(INDEX_PATH, embeddings, chunk_size=1000, chunk_overlap=100, sources=pdf_paths)
+    except ManifestMismatchError as e:
+        print(f"{e}; building in memory instead (rerun bulk_ingest.py to refresh it)")
+if vector_store is None:
+    # Load all PDF files in the folder, one worker process per core
+    documents, load_report = load_files_parallel(pdf_paths)
+    for entry in load_report:
+        if entry["error"]:
+            print(f"Error loading {entry['path']}: {entry['error']}")
+
+    text_splitter = OffsetTextSplitter(chunk_size=1000, chunk_overlap=100)
+    chunks = text_splitter.split_documents(documents)
+    vector_store = from_documents(chunks, embeddings)
 retriever = vector_store.as_retriever()
 prompt_template = ChatPromptTemplate.from_messages(
     [